@@ -0,0 +1,80 @@
+"""
+Synthetic series of the platforms, for the benchmarks. Each platform samples at its own rate with occasional gaps,
+and moves along a track in the Skagerrak, inside the regions of the local range thresholds. make_random_flags makes
+flags of tests, for the benchmarks of the flag functions.
+"""
+from typing import Dict, List, NamedTuple, Tuple
+
+import numpy as np
+
+from qclib.utils.qc_input import ColumnarQCInput
+
+
+class PlatformSeries(NamedTuple):
+    platform_code: str
+    # time steps in seconds and their probabilities
+    time_steps: Tuple[int, ...]
+    time_step_probabilities: Tuple[float, ...]
+    # degrees per time step
+    speed: float
+
+
+PLATFORMS: Dict[str, PlatformSeries] = {
+    'ferrybox': PlatformSeries('TF', (60, 59, 61, 3600), (0.98, 0.009, 0.009, 0.002), 2e-3),
+    'seaglider': PlatformSeries('Survey_2019_04/SeaGlider_1', (20, 60, 120, 1800), (0.3, 0.5, 0.18, 0.02), 2e-5),
+    'sailbuoy': PlatformSeries('Survey_2019_04/SB_Echo', (600, 900, 1800, 9000), (0.5, 0.3, 0.15, 0.05), 5e-3),
+    'waveglider': PlatformSeries('Survey_2019_04/Waveglider_1', (300, 600, 3600), (0.6, 0.35, 0.05), 2e-3),
+}
+
+
+def make_series(platform_name: str, number_of_points: int, seed: int = 0,
+                missing_fraction: float = 0.01) -> ColumnarQCInput:
+    """
+    Temperature like values of one of PLATFORMS: a daily cycle around 10 degrees with noise, spikes, frozen stretches
+    and missing values
+    """
+    platform = PLATFORMS[platform_name]
+    rnd = np.random.default_rng(seed)
+    steps = rnd.choice(platform.time_steps, p=platform.time_step_probabilities, size=number_of_points)
+    timestamps = np.datetime64('2019-04-01T00:00', 'ns') + np.cumsum(steps).astype('timedelta64[s]')
+
+    seconds = (timestamps - timestamps[0]).astype(np.int64) / 1e9
+    values = 10 + 4 * np.sin(2 * np.pi * seconds / 86400) + rnd.normal(0, 0.05, number_of_points)
+    spikes = rnd.random(number_of_points) < 0.002
+    values[spikes] += rnd.choice([-5., 5.], size=spikes.sum())
+    frozen = np.flatnonzero(rnd.random(number_of_points) < 0.001)
+    for start in frozen:
+        values[start:start + 10] = values[start]
+    values[rnd.random(number_of_points) < missing_fraction] = np.nan
+
+    # back and forth between the Oslofjord and the Skagerrak
+    position = np.cumsum(np.full(number_of_points, platform.speed)) % 8
+    position = np.where(position > 4, 8 - position, position)
+    longitudes = 10.6 + 0.1 * np.sin(position * 3) + rnd.normal(0, 1e-4, number_of_points)
+    latitudes = 59.8 - 0.6 * position + rnd.normal(0, 1e-4, number_of_points)
+    return ColumnarQCInput(timestamps, values, longitudes, latitudes)
+
+
+def make_pump_series(platform_name: str, number_of_points: int, seed: int = 0) -> ColumnarQCInput:
+    """Pump status, 1 with occasional stops, on the time axis of make_series"""
+    series = make_series(platform_name, number_of_points, seed)
+    rnd = np.random.default_rng(seed + 1)
+    pump = (rnd.random(number_of_points) > 0.005).astype(np.float64)
+    return series.with_values(pump)
+
+
+def make_random_flags(number_of_points: int, seed: int = 0, number_of_tests: int = 4) -> Tuple[Dict, List]:
+    """
+    Flag lists of the tests of one measurement, None at the same points, and two extra flag lists such as the GPS and
+    pump flags
+    """
+    rnd = np.random.default_rng(seed)
+    no_data = rnd.random(number_of_points) < 0.1
+    flags = {}
+    for i in range(number_of_tests):
+        test_flags = rnd.choice([-1, 0, 1, 1, 1], size=number_of_points).astype(object)
+        test_flags[no_data] = None
+        flags[f"test_{i}"] = test_flags.tolist()
+    extra_flags = [rnd.choice(np.array([None, -1, 0, 1, 1, 1], dtype=object), size=number_of_points).tolist()
+                   for _ in range(2)]
+    return flags, extra_flags
@@ -0,0 +1,33 @@
+"""
+Import time of a qclib module, measured in fresh interpreters.
+
+    python benchmarks/import_time.py [module] [repeats]
+"""
+import statistics
+import subprocess
+import sys
+
+SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start, 'matplotlib' in sys.modules, 'pandas' in sys.modules)
+"""
+
+
+def import_time(module: str = 'qclib.QC', repeats: int = 10):
+    """Median import time in seconds, and whether matplotlib and pandas were imported along"""
+    timings = []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, '-c', SCRIPT.format(module=module)], check=True,
+                                capture_output=True, text=True).stdout.split()
+        timings.append(float(output[0]))
+    return statistics.median(timings), output[1] == 'True', output[2] == 'True'
+
+
+if __name__ == '__main__':
+    module = sys.argv[1] if len(sys.argv) > 1 else 'qclib.QC'
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    seconds, matplotlib_imported, pandas_imported = import_time(module, repeats)
+    print(f"import {module}: {seconds * 1000:.1f} ms (median of {repeats}), "
+          f"matplotlib imported: {matplotlib_imported}, pandas imported: {pandas_imported}")
@@ -0,0 +1,59 @@
+"""
+Time of PlatformQC.get_overall_flag against its implementation with object arrays, on flag lists with None and on
+int8 flag arrays.
+
+    python benchmarks/overall_flag.py [number_of_points]
+"""
+import os
+import sys
+
+import numpy as np
+
+from qclib.PlatformQC import PlatformQC
+from qclib.utils.flags import flags_to_array
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from generators import make_random_flags  # noqa: E402
+from timing import best_time  # noqa: E402
+
+
+def get_overall_flag_with_object_arrays(flags, *extra_flag_lists):
+    """get_overall_flag as it was before the flags were int8 arrays"""
+    list_of_flags_lists = list(flags.values())
+    if list_of_flags_lists:
+        list_of_flags_lists_t = np.array(list_of_flags_lists).T
+        flag_none = np.any(list_of_flags_lists_t == None, axis=1)
+        if not all(flag_none == np.all(list_of_flags_lists_t == None, axis=1)):
+            raise Exception('If there is any None in a flag array they should all be None')
+    for extra_flag_list in extra_flag_lists:
+        if extra_flag_list is not None:
+            list_of_flags_lists.append(extra_flag_list)
+
+    list_of_flags_lists_t = np.array(list_of_flags_lists).T
+    if list_of_flags_lists_t.ndim <= 1:
+        return list_of_flags_lists
+    overall_flag = np.ones(len(list_of_flags_lists_t))
+    overall_flag[np.any(list_of_flags_lists_t == -1, axis=1)] = -1
+    overall_flag[np.any(list_of_flags_lists_t == None, axis=1)] = None
+    return [flag if flag in [-1, 0, 1] else None for flag in overall_flag.tolist()]
+
+
+def benchmark(number_of_points: int):
+    flags, extra_flags = make_random_flags(number_of_points)
+    flag_arrays = {test: flags_to_array(flag) for test, flag in flags.items()}
+    extra_flag_arrays = [flags_to_array(flag) for flag in extra_flags]
+    assert PlatformQC.get_overall_flag(flags, *extra_flags) == \
+        get_overall_flag_with_object_arrays(flags, *extra_flags)
+
+    object_arrays = best_time(lambda: get_overall_flag_with_object_arrays(flags, *extra_flags), repeats=5)
+    lists = best_time(lambda: PlatformQC.get_overall_flag(flags, *extra_flags), repeats=5)
+    arrays = best_time(lambda: PlatformQC.get_overall_flag(flag_arrays, *extra_flag_arrays, as_array=True),
+                       repeats=5)
+    print(f"{number_of_points} points, {len(flags)} tests and {len(extra_flags)} extra flags")
+    print(f"object arrays:   {object_arrays * 1000:.1f} ms")
+    print(f"lists:           {lists * 1000:.1f} ms, speedup {object_arrays / lists:.1f}")
+    print(f"int8 arrays:     {arrays * 1000:.1f} ms, speedup {object_arrays / arrays:.1f}")
+
+
+if __name__ == '__main__':
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,52 @@
+"""
+Time of PlatformQC.applyQC with the tests run sequentially and by thread and process pools of 1 to N workers, on
+SeaGlider like data.
+
+    python benchmarks/parallel_tests.py [number_of_points] [max_workers]
+"""
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from qclib import QC
+from qclib.utils.qc_input import ColumnarQCInput
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from timing import best_time, fresh  # noqa: E402
+
+TESTS = ["global_range_test", "local_range_test", "argo_spike_test", "frozen_test", "missing_value_test"]
+
+
+def make_glider_data(number_of_points: int, seed: int = 0) -> ColumnarQCInput:
+    rnd = np.random.default_rng(seed)
+    # about a minute between samples, with some gaps
+    steps = rnd.choice([55, 60, 60, 60, 65, 7200], size=number_of_points)
+    timestamps = np.datetime64('2019-04-01T00:00', 'ns') + np.cumsum(steps).astype('timedelta64[s]')
+    values = 8 + np.cumsum(rnd.normal(0, 0.05, number_of_points))
+    longitudes = 10.5 + np.cumsum(rnd.normal(0, 1e-4, number_of_points))
+    latitudes = 59.5 + np.cumsum(rnd.normal(0, 1e-4, number_of_points))
+    return ColumnarQCInput(timestamps, values, longitudes, latitudes)
+
+
+def benchmark(number_of_points: int, max_workers: int):
+    platform = QC.init('Survey_2019_04/SeaGlider_1')
+    data = make_glider_data(number_of_points)
+    expected = platform.applyQC(data, "temperature", TESTS)
+    sequential = best_time(lambda: platform.applyQC(fresh(data), "temperature", TESTS))
+    print(f"{number_of_points} points, {len(TESTS)} tests, {os.cpu_count()} cores")
+    print(f"sequential: {sequential:.3f} s")
+    for name, executor_class in [("threads", ThreadPoolExecutor), ("processes", ProcessPoolExecutor)]:
+        for workers in range(1, max_workers + 1):
+            with executor_class(max_workers=workers) as executor:
+                assert platform.applyQC(data, "temperature", TESTS, executor=executor) == expected
+                seconds = best_time(
+                    lambda: platform.applyQC(fresh(data), "temperature", TESTS, executor=executor))
+            print(f"{name} {workers}: {seconds:.3f} s, speedup {sequential / seconds:.2f}")
+
+
+if __name__ == '__main__':
+    number_of_points = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else min(os.cpu_count() or 1, len(TESTS))
+    benchmark(number_of_points, max_workers)
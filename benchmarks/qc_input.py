@@ -0,0 +1,31 @@
+"""
+Time of the pydantic validation of QCInput against the conversion of unvalidated rows to ColumnarQCInput, the path
+used within qclib for data that has already been validated.
+
+    python benchmarks/qc_input.py [number_of_rows]
+"""
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from timing import best_time  # noqa: E402
+
+from qclib.utils.qc_input import ColumnarQCInput, QCInput  # noqa: E402
+
+
+def benchmark(number_of_rows: int):
+    start = datetime(2017, 1, 12, 14, 8, 6)
+    values = [(start + timedelta(seconds=60 * i), float(i)) for i in range(number_of_rows)]
+    locations = [(start + timedelta(seconds=60 * i), 10., 60.) for i in range(number_of_rows)]
+
+    validation = best_time(lambda: QCInput(values=values, locations=locations))
+    conversion = best_time(
+        lambda: ColumnarQCInput.from_qc_input(QCInput.construct(values=values, locations=locations)))
+    print(f"{number_of_rows} rows")
+    print(f"validation: {validation / number_of_rows * 1e6:.2f} us/row")
+    print(f"conversion: {conversion / number_of_rows * 1e6:.2f} us/row, speedup {validation / conversion:.1f}")
+
+
+if __name__ == '__main__':
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
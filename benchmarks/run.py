@@ -0,0 +1,121 @@
+"""
+Benchmark suite: throughput of every QC test, QC.execute latency and peak memory on the synthetic series of each
+platform (see generators.py), and the import time of qclib. Runs offline with the dependencies of qclib only.
+
+    python benchmarks/run.py [--sizes 1000,10000,100000,1000000] [--platforms ferrybox,seaglider,...]
+                             [--repeats 3] [--json results.json] [--compare baseline.json] [--tolerance 1.5]
+
+With --compare, the timings are compared with the ones of a previous --json run and the exit status is 1 when any
+of them is more than tolerance times slower.
+"""
+import argparse
+import json
+import os
+import sys
+import tracemalloc
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from generators import PLATFORMS, make_pump_series, make_series  # noqa: E402
+from import_time import import_time  # noqa: E402
+from timing import best_time, fresh  # noqa: E402
+
+from qclib import QC  # noqa: E402
+
+# every test, with the measurement it is run for
+TESTS = [("temperature", "global_range_test"),
+         ("temperature", "local_range_test"),
+         ("temperature", "argo_spike_test"),
+         ("temperature", "frozen_test"),
+         ("temperature", "missing_value_test"),
+         ("depth", "flatness_test"),
+         ("velocity", "bounded_variance_test"),
+         ("pump", "pump_history_test")]
+EXECUTE_TESTS = ["global_range_test", "local_range_test", "argo_spike_test", "frozen_test", "missing_value_test"]
+
+
+def peak_memory(function: Callable[[], object]) -> int:
+    """Peak of the memory allocated by function in bytes, NumPy arrays included"""
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark_platform(platform_name: str, size: int, repeats: int) -> Dict[str, float]:
+    platform = QC.init(PLATFORMS[platform_name].platform_code)
+    series = make_series(platform_name, size)
+    valid = series.compress(series.mask)
+    pump = make_pump_series(platform_name, size)
+    results = {}
+    for measurement_name, test in TESTS:
+        data = pump if measurement_name == "pump" else valid
+        seconds = best_time(lambda: platform.applyQC(fresh(data), measurement_name, [test], as_array=True), repeats)
+        results[f"{test}/{measurement_name}"] = seconds
+
+    results["QC.execute"] = best_time(
+        lambda: QC.execute(platform, fresh(series), "temperature", EXECUTE_TESTS, as_array=True), repeats)
+    results["QC.execute lists"] = best_time(
+        lambda: QC.execute(platform, fresh(series), "temperature", EXECUTE_TESTS), repeats)
+    results["QC.execute peak MB"] = peak_memory(
+        lambda: QC.execute(platform, fresh(series), "temperature", EXECUTE_TESTS, as_array=True)) / 1e6
+    return results
+
+
+def run(sizes: List[int], platforms: List[str], repeats: int) -> Dict[str, float]:
+    results = {}
+    seconds, _, _ = import_time('qclib.QC', repeats=max(repeats, 3))
+    results["import qclib.QC"] = seconds
+    print(f"import qclib.QC: {seconds * 1000:.1f} ms")
+    for platform_name in platforms:
+        for size in sizes:
+            print(f"\n{platform_name}, {size} points")
+            for name, value in benchmark_platform(platform_name, size, repeats).items():
+                results[f"{platform_name}/{size}/{name}"] = value
+                if name.endswith("MB"):
+                    print(f"  {name:40s} {value:10.1f}")
+                else:
+                    print(f"  {name:40s} {value * 1000:10.2f} ms {size / value / 1e6:10.2f} M points/s")
+    return results
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> bool:
+    """Prints the ratios to the baseline, returns False if any timing is more than tolerance times the baseline"""
+    ok = True
+    print(f"\nCompared with the baseline, tolerance {tolerance}")
+    for name, value in results.items():
+        if name not in baseline or name.endswith("MB") or baseline[name] <= 0:
+            continue
+        ratio = value / baseline[name]
+        regression = ratio > tolerance
+        ok &= not regression
+        print(f"  {name:60s} {ratio:6.2f}{'  REGRESSION' if regression else ''}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000,10000,100000,1000000',
+                        help="numbers of points, comma separated, up to 10000000")
+    parser.add_argument('--platforms', default=','.join(PLATFORMS), help="platforms, comma separated")
+    parser.add_argument('--repeats', type=int, default=3, help="the best of repeats runs is kept")
+    parser.add_argument('--json', help="file the results are written to")
+    parser.add_argument('--compare', help="results of a previous run to compare with")
+    parser.add_argument('--tolerance', type=float, default=1.5)
+    arguments = parser.parse_args()
+
+    results = run([int(float(size)) for size in arguments.sizes.split(',')], arguments.platforms.split(','),
+                  arguments.repeats)
+    if arguments.json:
+        with open(arguments.json, 'w') as file:
+            json.dump(results, file, indent=2)
+    if arguments.compare:
+        with open(arguments.compare) as file:
+            if not compare(results, json.load(file), arguments.tolerance):
+                sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Simulated load on QCService: clients sending small requests concurrently, with the requests coalesced and without
+(max_batch_size=1 executes every request on its own).
+
+    python benchmarks/service_load.py [number_of_clients] [requests_per_client] [points_per_request]
+"""
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from generators import make_series  # noqa: E402
+
+from qclib.QCService import QCService  # noqa: E402
+
+tests = ["global_range_test", "local_range_test", "missing_value_test"]
+
+
+async def client(service: QCService, series, requests_per_client: int, points_per_request: int, latencies: list):
+    for i in range(requests_per_client):
+        request = series[i * points_per_request:(i + 1) * points_per_request]
+        start = time.perf_counter()
+        await service.execute('TF', request, "temperature", tests, as_array=True)
+        latencies.append(time.perf_counter() - start)
+
+
+async def load(service: QCService, number_of_clients: int, requests_per_client: int, points_per_request: int):
+    all_series = [make_series('ferrybox', requests_per_client * points_per_request, seed=seed)
+                  for seed in range(number_of_clients)]
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*[client(service, series, requests_per_client, points_per_request, latencies)
+                           for series in all_series])
+    return time.perf_counter() - start, np.array(latencies)
+
+
+def benchmark(number_of_clients: int = 100, requests_per_client: int = 20, points_per_request: int = 60):
+    number_of_requests = number_of_clients * requests_per_client
+    print(f"{number_of_clients} clients, {requests_per_client} requests of {points_per_request} points each")
+    for name, service in [("one by one", QCService(max_batch_size=1)), ("coalesced", QCService())]:
+        seconds, latencies = asyncio.run(load(service, number_of_clients, requests_per_client, points_per_request))
+        print(f"{name:12s} {number_of_requests / seconds:8.0f} requests/s, latency median "
+              f"{np.median(latencies) * 1000:.2f} ms, p99 {np.percentile(latencies, 99) * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    benchmark(*[int(arg) for arg in sys.argv[1:]])
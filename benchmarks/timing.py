@@ -0,0 +1,22 @@
+"""
+Timing helpers shared by the benchmarks
+"""
+import time
+from typing import Callable
+
+from qclib.utils.qc_input import ColumnarQCInput
+
+
+def best_time(function: Callable[[], object], repeats: int = 3) -> float:
+    """Shortest of repeats runs of function in seconds"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def fresh(data: ColumnarQCInput) -> ColumnarQCInput:
+    """Same arrays without the cached quantities, so that every run computes them"""
+    return ColumnarQCInput.from_arrays(data.timestamps, data.values, data.longitudes, data.latitudes, data.mask)
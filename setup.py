@@ -60,13 +60,15 @@ setup(
     package_dir={'': 'src'},
     install_requires=[
         'pandas>=1.1,<2.0',
-        'numpy>=1.16,<2.0',
-        'pydantic>=1.0,<2.0',
-        'matplotlib>=3.0,<4.0'
+        'numpy>=1.20,<2.0',
+        'pydantic>=1.0,<2.0'
     ],
     extras_require={
       "test": [
           "pytest"
+      ],
+      "parquet": [
+          "pyarrow"
       ]
     },
     test_suite='tests',
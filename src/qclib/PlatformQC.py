@@ -1,12 +1,17 @@
 import copy
+from concurrent.futures import Executor
 import numpy as np
-import logging
-from typing import Dict, List, Optional, Union, Any
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple, Union
 import warnings
 
+from qclib.QCMetrics import QCMetrics, measured
+from qclib.QCPlan import QCPlan, get_plan
 from qclib.QCTests import QCTests
 from qclib.utils import Thresholds
-from qclib.utils.qc_input import QCInput
+from qclib.utils.flags import FLAG_DTYPE, NO_DATA, FlagsLike, empty_flags, flags_to_array, flags_to_list
+from qclib.utils.qc_input import QCInputLike
+from qclib.utils.qc_input_helpers import as_columnar
 
 common_tests = {
     '*':
@@ -17,16 +22,16 @@ common_tests = {
     'temperature':
         {'global_range_test': [QCTests.range_test,
                                Thresholds.global_range_temperature],
-         'local_range_test': [QCTests.range_test,
-                              Thresholds.local_range_temperature],
+         'local_range_test': [QCTests.local_range_test,
+                              {'thresholds': Thresholds.local_range_temperature}],
          'argo_spike_test': [QCTests.argo_spike_test,
                              {'spike_threshold': Thresholds.spike_thresholds['temperature']}
                              ]},
     'salinity':
         {'global_range_test': [QCTests.range_test,
                                Thresholds.global_range_salinity],
-         'local_range_test': [QCTests.range_test,
-                              Thresholds.local_range_salinity],
+         'local_range_test': [QCTests.local_range_test,
+                              {'thresholds': Thresholds.local_range_salinity}],
          'argo_spike_test': [QCTests.argo_spike_test,
                              {'spike_threshold': Thresholds.spike_thresholds['salinity']}
                              ]},
@@ -34,14 +39,14 @@ common_tests = {
     'chla_fluorescence':
         {'global_range_test': [QCTests.range_test,
                                Thresholds.global_range_chla_fluorescence],
-         'local_range_test': [QCTests.range_test,
-                              Thresholds.local_range_chla_fluorescence]},
+         'local_range_test': [QCTests.local_range_test,
+                              {'thresholds': Thresholds.local_range_chla_fluorescence}]},
 
     'oxygen_concentration':
         {'global_range_test': [QCTests.range_test,
                                Thresholds.global_range_oxygen],
-         'local_range_test': [QCTests.range_test,
-                              Thresholds.local_range_oxygen],
+         'local_range_test': [QCTests.local_range_test,
+                              {'thresholds': Thresholds.local_range_oxygen}],
          'argo_spike_test': [QCTests.argo_spike_test,
                              {'spike_threshold': Thresholds.spike_thresholds['oxygen']}]},
 
@@ -59,95 +64,247 @@ common_tests = {
 
 class PlatformQC(QCTests):
     sampling_interval = 60
-    accept_time_difference = 3
+    # largest time step in seconds within a series, a larger one is a gap in data taking that the windows of the tests
+    # do not span (option max_gap of the window tests, see utils.segments). None to only compare the time steps with
+    # each other
+    accept_time_difference: Optional[float] = None
+
+    # per instance copy of the tests, only made by edit_qc_tests or the qc_tests setter
+    _qc_tests: Optional[Dict] = None
+    # frozen instances are shared (QC.init), their tests can not be modified, see freeze
+    _frozen = False
+    # plans of a frozen instance with its own tests, and read-only view of the tests of a frozen instance
+    _plans: Optional[Dict[Tuple[str, Tuple[str, ...]], QCPlan]] = None
+    _read_only_qc_tests: Optional[Mapping] = None
 
     def __init__(self):
-        self.qc_tests = copy.deepcopy(common_tests)
-        for key in self.qc_tests.keys():
-            if key != "*":
-                self.qc_tests[key].update(self.qc_tests['*'])
+        self._qc_tests = None
+
+    def __getstate__(self):
+        # plans and views are rebuilt in other processes
+        state = self.__dict__.copy()
+        state.pop('_plans', None)
+        state.pop('_read_only_qc_tests', None)
+        return state
+
+    def freeze(self) -> 'PlatformQC':
+        """
+        Makes the tests of this instance read-only so that it can be shared, as the instances of QC.init. Its plans are
+        then compiled once even when it has its own tests. Use with_overrides to change the tests of a frozen instance.
+        """
+        self._frozen = True
+        return self
+
+    @property
+    def is_frozen(self) -> bool:
+        return self._frozen
+
+    def with_overrides(self, overrides: Dict[str, Dict[str, Union[Dict, List]]]) -> 'PlatformQC':
+        """
+        Frozen copy of this platform with some tests replaced, overrides = {measurement_name: {test: options}} where
+        options replace the options of the test, or {test: [function, options]} to add or replace a test. Window tests
+        get max_gap as in default_qc_tests unless it is given. Only the overridden measurements are copied, the other
+        tests are shared with this platform when it is frozen, copied otherwise, e.g.
+
+            platform = QC.init('TF').with_overrides({'temperature': {'global_range_test': {'min': -2, 'max': 30}}})
+        """
+        if self._qc_tests is None:
+            qc_tests = dict(self.default_qc_tests())
+        elif self._frozen:
+            qc_tests = dict(self._qc_tests)
+        else:
+            # the tests of this instance may still be modified, the copy must not share them
+            qc_tests = copy.deepcopy(self._qc_tests)
+        for measurement_name, measurement_overrides in overrides.items():
+            measurement_tests = dict(qc_tests.get(measurement_name, qc_tests['*']))
+            for test, options in copy.deepcopy(measurement_overrides).items():
+                if isinstance(options, list) and len(options) == 2 and callable(options[0]):
+                    measurement_tests[test] = [options[0], self.with_max_gap(*options)]
+                elif test in measurement_tests:
+                    function = measurement_tests[test][0]
+                    measurement_tests[test] = [function, self.with_max_gap(function, options)]
+                else:
+                    raise Exception(f"This test: '{test}' is not available for this measurement '{measurement_name}'")
+            qc_tests[measurement_name] = measurement_tests
+        platform = copy.copy(self)
+        platform._qc_tests = qc_tests
+        platform._plans = None
+        platform._read_only_qc_tests = None
+        return platform.freeze()
+
+    @classmethod
+    def default_qc_tests(cls) -> Dict:
+        """
+        common_tests with the tests of '*' added to every measurement, built once per class and shared by all the
+        instances that do not modify their tests. It must not be modified, use edit_qc_tests instead.
+        The window tests get the option max_gap = accept_time_difference.
+        """
+        if '_default_qc_tests' not in cls.__dict__:
+            qc_tests = copy.deepcopy(common_tests)
+            for key in qc_tests.keys():
+                if key != "*":
+                    qc_tests[key].update(qc_tests['*'])
+            for measurement_tests in qc_tests.values():
+                for test in measurement_tests.values():
+                    test[1] = cls.with_max_gap(*test[:2])
+            cls._default_qc_tests = qc_tests
+        return cls._default_qc_tests
+
+    @classmethod
+    def with_max_gap(cls, function: Callable, options: Union[Dict, List[Dict]]) -> Union[Dict, List[Dict]]:
+        """Options of function with max_gap = accept_time_difference when it is a window test and max_gap is not set"""
+        is_window_test = getattr(function, 'number_of_historical', 0) or getattr(function, 'number_of_future', 0)
+        if cls.accept_time_difference is None or not is_window_test:
+            return options
+        if isinstance(options, list):
+            return [cls.with_max_gap(function, run_options) for run_options in options]
+        return {'max_gap': cls.accept_time_difference, **options}
+
+    @property
+    def qc_tests(self) -> Mapping:
+        """
+        Read-only view of the tests of this platform, default_qc_tests unless they have been modified with
+        edit_qc_tests or replaced. Reading the tests does not copy them.
+        """
+        if self._qc_tests is None:
+            return self.read_only_default_qc_tests()
+        if self._frozen:
+            if self._read_only_qc_tests is None:
+                self._read_only_qc_tests = read_only(self._qc_tests)
+            return self._read_only_qc_tests
+        # the tests of this instance may still be modified after the view is returned
+        return read_only(self._qc_tests)
+
+    @classmethod
+    def read_only_default_qc_tests(cls) -> Mapping:
+        """Read-only view of default_qc_tests, built once per class"""
+        if '_read_only_default_qc_tests' not in cls.__dict__:
+            cls._read_only_default_qc_tests = read_only(cls.default_qc_tests())
+        return cls._read_only_default_qc_tests
+
+    def edit_qc_tests(self) -> Dict:
+        """
+        Tests of this instance that may be modified, a copy of default_qc_tests made on the first call. Once the tests
+        have been copied, applyQC compiles them on every call instead of using the plans cached for the class.
+        """
+        if self._frozen:
+            raise AttributeError("The tests of a frozen platform can not be modified, use with_overrides")
+        if self._qc_tests is None:
+            self._qc_tests = copy.deepcopy(self.default_qc_tests())
+        return self._qc_tests
+
+    @qc_tests.setter
+    def qc_tests(self, qc_tests: Dict):
+        if self._frozen:
+            raise AttributeError("The tests of a frozen platform can not be modified, use with_overrides")
+        self._qc_tests = qc_tests
+
+    def plan(self, measurement_name: str, tests: List[str]) -> QCPlan:
+        """
+        Compiled tests of a measurement, cached per (platform class, measurement, tests) for the default tests and per
+        instance for a frozen instance with its own tests
+        """
+        if self._qc_tests is None:
+            return get_plan(type(self), measurement_name, tests)
+        if self._frozen:
+            key = (measurement_name, tuple(tests))
+            if self._plans is None:
+                self._plans = {}
+            if key not in self._plans:
+                self._plans[key] = QCPlan.compile(self._qc_tests, measurement_name, tests, self.get_combined_flag)
+            return self._plans[key]
+        # the tests of this instance may have been modified since the last call
+        return QCPlan.compile(self._qc_tests, measurement_name, tests, self.get_combined_flag)
 
     @staticmethod
-    def get_combined_flag(flags: List[List[int]]) -> np.ndarray:
-        transposed_flags = np.array(flags).T
-        flag_0 = np.all(transposed_flags == 0, axis=1)
-        flag_1 = np.any(transposed_flags == -1, axis=1)
-        combined_flag = np.ones(len(transposed_flags), dtype=int)
-        combined_flag[flag_1] = -1
-        combined_flag[flag_0] = 0
-        return combined_flag.tolist()
-
-    def applyQC(self, qc_input: QCInput, measurement_name: str, tests: List[str]) -> Dict[str, List[int]]:
-        """
-        """
-
-        flags = {}
-        if measurement_name not in self.qc_tests:
-            logging.debug(f"'{measurement_name}' is not defined in qc_tests, using default tests instead")
-            measurement_name = "*"
-
-        for test in tests:
-            if test not in self.qc_tests[measurement_name]:
-                raise Exception(f"This test: '{test}' is not available for this measurement '{measurement_name}'")
-            if type(self.qc_tests[measurement_name][test][1]) is list:  # only local range test
-                arr = [[test, self.qc_tests[measurement_name][test][0], x] for x in
-                       self.qc_tests[measurement_name][test][1]]
-                flag = []
-                for n, a in enumerate(arr):
-                    flag.append(a[1](qc_input, **a[2]))
-                flags[test] = self.get_combined_flag(flag)
-            else:
-                flags[test] = self.qc_tests[measurement_name][test][0](qc_input, **self.qc_tests[measurement_name][test][1])
-        return flags
+    def get_combined_flag(flags: List[FlagsLike], as_array: bool = False) -> FlagsLike:
+        """-1 if any of the flags is -1, 0 if all of them are 0 and 1 otherwise"""
+        flags = np.array([flags_to_array(flag) for flag in flags], dtype=FLAG_DTYPE)
+        combined_flag = np.ones(flags.shape[1] if flags.ndim == 2 else 0, dtype=FLAG_DTYPE)
+        combined_flag[np.any(flags == -1, axis=0)] = -1
+        combined_flag[np.all(flags == 0, axis=0)] = 0
+        return combined_flag if as_array else combined_flag.tolist()
+
+    def applyQC(self, qc_input: QCInputLike, measurement_name: str, tests: List[str],
+                executor: Optional[Executor] = None, as_array: bool = False,
+                metrics: Optional[QCMetrics] = None) -> Dict[str, FlagsLike]:
+        """
+        The input is converted to a ColumnarQCInput once, all the tests then work on the same arrays. The tests are
+        looked up once per (platform class, measurement, tests), see plan.
+        With an executor (concurrent.futures) the tests run concurrently, see QCPlan.execute.
+        The flags are lists, or int8 arrays with as_array.
+        With metrics, applyQC and every test are recorded as QCMeasurements, see QCMetrics.
+        """
+        if metrics is None:
+            return self.plan(measurement_name, tests).execute(as_columnar(qc_input), executor=executor,
+                                                              as_array=as_array)
+        return measured(metrics, 'applyQC', measurement_name, len(qc_input.values),
+                        lambda: self.plan(measurement_name, tests).execute(as_columnar(qc_input), executor=executor,
+                                                                           as_array=as_array, metrics=metrics))
+
+    def additional_data_size(self, measurement_name: str, tests: List[str]) -> Tuple[int, int]:
+        """
+        Largest number of historical and future points needed by the tests, as declared with
+        qctest_additional_data_size. The flag of a point only depends on the points in this range around it.
+        """
+        all_tests = self.default_qc_tests() if self._qc_tests is None else self._qc_tests
+        qc_tests = all_tests.get(measurement_name, all_tests['*'])
+        functions = [qc_tests[test][0] for test in tests if test in qc_tests]
+        number_of_historical = max([getattr(function, 'number_of_historical', 0) for function in functions], default=0)
+        number_of_future = max([getattr(function, 'number_of_future', 0) for function in functions], default=0)
+        return number_of_historical, number_of_future
 
     @staticmethod
-    def get_overall_flag(flags: Dict[str, List[int]], *extra_flag_lists: Optional[List[int]]) -> List[int]:
+    def get_overall_flag(flags: Dict[str, FlagsLike], *extra_flag_lists: Optional[FlagsLike],
+                         as_array: bool = False) -> FlagsLike:
         """
         Current function calculates overall flags for the list of values for one parameter
         # Overall Flag can be calculated from different combinations of QC flags :
         # 1. flags related to the given variable + gsp flags + pump status flags
         # 2. gsp flags + pump status flags
         # 3. only gsp flags (for parameters not affected by pump status)
+        With as_array the flags may be lists or int8 arrays and the overall flag is an int8 array, NO_DATA for None.
         """
-        if not flags:
-            # If flags dict is empty
-            list_of_flags_lists: Union[List[Any], Any] = []
-        else:
-            list_of_flags_lists = list(flags.values())
-            if len(list_of_flags_lists) > 0:
-                verify_if_any_none_all_none(list_of_flags_lists)
+        overall_flag = get_overall_flag_array([flags_to_array(flag) for flag in flags.values()],
+                                              [flags_to_array(flag) for flag in extra_flag_lists if flag is not None])
+        return overall_flag if as_array else flags_to_list(overall_flag)
 
-        # TODO: add assert that at least one list with flags should be not empty
-        for extra_flag_list in extra_flag_lists:
-            if extra_flag_list is not None:
-                list_of_flags_lists.append(extra_flag_list)
-
-        list_of_flags_lists_T = np.array(list_of_flags_lists).T
-        if list_of_flags_lists_T.ndim > 1:
-            # flags_all_zeroes = np.all(list_of_flags_lists_T == 0, axis=1)
-            flags_have_negative_one = np.any(list_of_flags_lists_T == -1, axis=1)
-            logging.debug(f"'{flags_have_negative_one, list_of_flags_lists_T}' is not defined in qc_tests, using "
-                          f"default tests instead")
-            flags_have_nones = np.any(list_of_flags_lists_T == None, axis=1)
+    @classmethod
+    def flag2copernicus(cls, flag: FlagsLike, as_array: bool = False) -> FlagsLike:
+        " This function translates between -1,0,1 convention to copernicus convention 0,1,4 "
+        if as_array:
+            flag = flags_to_array(flag)
+            return np.where(flag == -1, 4, flag).astype(FLAG_DTYPE)
+        return [fl if fl != -1 else 4 for fl in flag]
 
-            overall_flag = np.ones(len(list_of_flags_lists_T))
 
-            overall_flag[flags_have_negative_one] = -1
-            overall_flag[flags_have_nones] = None
+def get_overall_flag_array(flag_arrays: List[np.ndarray], extra_flag_arrays: List[np.ndarray]) -> np.ndarray:
+    """
+    get_overall_flag on int8 arrays: NO_DATA where any of the flags is NO_DATA, otherwise -1 where any of the flags
+    is -1 and 1 elsewhere. The flags of the tests have to be NO_DATA at the same points.
+    """
+    all_flags = flag_arrays + extra_flag_arrays
+    if not all_flags:
+        return empty_flags(0)
+    if flag_arrays:
+        verify_if_any_none_all_none(flag_arrays)
+    all_flags = np.stack(all_flags)
+    overall_flag = np.ones(all_flags.shape[1], dtype=FLAG_DTYPE)
+    overall_flag[np.any(all_flags == -1, axis=0)] = -1
+    overall_flag[np.any(all_flags == NO_DATA, axis=0)] = NO_DATA
+    return overall_flag
 
-            final_flag = [flag if flag in [-1, 0, 1] else None for flag in overall_flag.tolist()]
-        else:
-            final_flag = list_of_flags_lists
-        return final_flag
 
-    @classmethod
-    def flag2copernicus(cls, flag: List[int]) -> List[int]:
-        " This function translates between -1,0,1 convention to copernicus convention 0,1,4 "
-        return [fl if fl != -1 else 4 for fl in flag]
+def read_only(qc_tests: Any) -> Any:
+    """Read-only view of a dictionary of tests, dictionaries become MappingProxyTypes and lists tuples"""
+    if isinstance(qc_tests, dict):
+        return MappingProxyType({key: read_only(value) for key, value in qc_tests.items()})
+    if isinstance(qc_tests, list):
+        return tuple(read_only(value) for value in qc_tests)
+    return qc_tests
 
 
-def verify_if_any_none_all_none(list_of_flags_lists: List[List[int]]):
-    list_of_flags_lists_T = np.array(list_of_flags_lists).T
-    flag_none = np.any(list_of_flags_lists_T == None, axis=1)
-    if not all(flag_none == np.all(list_of_flags_lists_T == None, axis=1)):
+def verify_if_any_none_all_none(list_of_flags_lists: List[FlagsLike]):
+    no_data = np.stack([flags_to_array(flags) for flags in list_of_flags_lists]) == NO_DATA
+    if not np.array_equal(no_data.any(axis=0), no_data.all(axis=0)):
         raise Exception('If there is any None in a flag array they should all be None')
@@ -10,9 +10,12 @@ class FerryboxQC(PlatformQC.PlatformQC):
         super().__init__()
         extra_tests = {}
         # This is how to overwrite thresholds
-        # self.qc_tests['temperature']["GLOBAL_RANGE"][1]=Thresholds.Global_Threshold_Ranges.Temperature_Ferrybox
-        # And extra tests can be added
-        self.qc_tests.update(extra_tests)
+        # self.edit_qc_tests()['temperature']["GLOBAL_RANGE"][1]=Thresholds.Global_Threshold_Ranges.Temperature_Ferrybox
+        # And extra tests can be added, as [function, options]. They are called as function(qc_input, **options) with
+        # a QCInput of the values that are not None and return one flag per value. Instances that modify their tests
+        # compile them on every applyQC call, instead of using the plans cached for the class
+        if extra_tests:
+            self.edit_qc_tests().update(extra_tests)
 
 # Glider have in general unstable sampling interval.
 # NUmber below are given as an upper limit for sampling interval and the accept_time difference
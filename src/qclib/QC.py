@@ -1,12 +1,20 @@
 import logging
-from typing import Dict, List
+from concurrent.futures import Executor
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
 
 from qclib import Platforms
 from qclib.PlatformQC import PlatformQC
-from qclib.utils.qc_input import QCInput
-from qclib.utils.qc_input_helpers import remove_nans, flags_resized_to_include_values_for_nan
+from qclib.QCMetrics import QCMetrics, measured
+from qclib.utils.qc_input import ColumnarQCInput, QCInputLike
+from qclib.utils.flags import NO_DATA, FlagsLike, empty_flags, flags_to_list
+from qclib.utils.qc_input_helpers import as_columnar, remove_nans, flag_arrays_resized_to_include_no_data
+from qclib.utils.segments import segment_index
 from qclib.utils.validate_input import assert_is_sorted
 
+DEFAULT_CHUNK_SIZE = 100000
+
 # NOTE: when a new platform is added it has to be added to the array below, with "new_platform": Common.PlatformQC
 platform_dict = {'TF': Platforms.FerryboxQC,
                  'FA': Platforms.FerryboxQC,
@@ -22,28 +30,254 @@ platform_dict = {'TF': Platforms.FerryboxQC,
                  'Survey_2019_test/Waveglider_1': Platforms.WaveGliderQC}
 
 
-def init(name):
-    if name not in platform_dict:
-        return PlatformQC()
-    else:
-        return platform_dict[name]()
+# shared instance of each platform class, see init
+_platforms: Dict[type, PlatformQC] = {}
+
+
+def init(name) -> PlatformQC:
+    """
+    Platform of platform_dict[name], PlatformQC if name is not registered. The platforms are frozen instances shared
+    by all the calls for the same class: their tests can not be modified, use PlatformQC.with_overrides for a
+    platform with other tests.
+    """
+    platform_class = platform_dict.get(name, PlatformQC)
+    if platform_class not in _platforms:
+        _platforms[platform_class] = platform_class().freeze()
+    return _platforms[platform_class]
+
+
+def register_platform(name: str, platform_class: type):
+    """Adds or replaces the platform class of name in platform_dict, e.g. register_platform('NewCode', FerryboxQC)"""
+    if not (isinstance(platform_class, type) and issubclass(platform_class, PlatformQC)):
+        raise ValueError(f"{platform_class} is not a subclass of PlatformQC")
+    platform_dict[name] = platform_class
+
+
+def execute(platform: PlatformQC, qc_input: QCInputLike, measurement_name: str,
+            tests: List[str], executor: Optional[Executor] = None, as_array: bool = False,
+            metrics: Optional[QCMetrics] = None) -> Dict[str, FlagsLike]:
+    # QCInput is converted to its columnar form once, everything below works on the arrays.
+    # Flags are int8 arrays with NO_DATA for the points without a value, converted to lists with None unless as_array
+    # With metrics, execute and each of its stages and tests are recorded as QCMeasurements, see QCMetrics
+    return measured(metrics, 'execute', measurement_name, len(qc_input.values), _execute, platform, qc_input,
+                    measurement_name, tests, executor, as_array, metrics)
 
 
-def execute(platform: PlatformQC, qc_input: QCInput, measurement_name: str, tests: List[str]) -> Dict[str, List[int]]:
+def _execute(platform: PlatformQC, qc_input: QCInputLike, measurement_name: str, tests: List[str],
+             executor: Optional[Executor], as_array: bool, metrics: Optional[QCMetrics]) -> Dict[str, FlagsLike]:
+    size = len(qc_input.values)
+    qc_input = measured(metrics, 'as_columnar', measurement_name, size, as_columnar, qc_input)
+    measured(metrics, 'assert_is_sorted', measurement_name, size, assert_is_sorted, qc_input)
+    qc_input_without_none_values = measured(metrics, 'remove_nans', measurement_name, size, remove_nans, qc_input)
+    flags = _execute_without_none_values(platform, qc_input, qc_input_without_none_values, measurement_name, tests,
+                                         executor=executor, metrics=metrics)
+    return flags if as_array else measured(metrics, 'as_lists', measurement_name, size, _as_lists, flags)
+
+
+def execute_many(platform: PlatformQC, timestamps: Sequence, values: Dict[str, Sequence], tests: Dict[str, List[str]],
+                 longitudes: Optional[Sequence] = None,
+                 latitudes: Optional[Sequence] = None,
+                 executor: Optional[Executor] = None,
+                 as_array: bool = False,
+                 metrics: Optional[QCMetrics] = None) -> Dict[str, Dict[str, FlagsLike]]:
+    """
+    QC of several measurements of one platform sharing the same timestamps and locations, e.g. all the sensors of a
+    ferrybox. values and tests are keyed by measurement name, values[measurement_name] holds one value per timestamp
+    (None or NaN where there is no value). Returns the flags of QC.execute for each measurement.
+    What only depends on the timestamps and locations (time steps, months, region membership) is computed once, for
+    all the measurements with values at the same timestamps.
+    With metrics, applyQC and the tests of each measurement are recorded as QCMeasurements, see QCMetrics.
+    """
+    axis = ColumnarQCInput(timestamps, np.zeros(len(timestamps)), longitudes, latitudes)
+    assert_is_sorted(axis)
+    axis_without_none_values = {}
+    flags = {}
+    for measurement_name, measurement_tests in tests.items():
+        qc_input = axis.with_values(values[measurement_name])
+        key = np.packbits(qc_input.mask).tobytes()
+        if key not in axis_without_none_values:
+            axis_without_none_values[key] = axis if qc_input.mask.all() else axis.compress(qc_input.mask)
+        qc_input_without_none_values = axis_without_none_values[key].with_values(qc_input.values[qc_input.mask])
+        measurement_flags = _execute_without_none_values(platform, qc_input, qc_input_without_none_values,
+                                                         measurement_name, measurement_tests, executor=executor,
+                                                         metrics=metrics)
+        flags[measurement_name] = measurement_flags if as_array else measured(
+            metrics, 'as_lists', measurement_name, len(qc_input), _as_lists, measurement_flags)
+    return flags
+
+
+def execute_batch(platform: PlatformQC, qc_inputs: Sequence[QCInputLike], measurement_name: str, tests: List[str],
+                  as_array: bool = False) -> List[Dict[str, FlagsLike]]:
+    """
+    Flags of QC.execute for each of qc_inputs, independent series of one platform and measurement. When the tests
+    only look at one point at a time (no historical nor future points, see PlatformQC.additional_data_size) they run
+    once on the concatenation of the inputs, which saves their overhead per call on many small inputs.
+    """
+    number_of_historical, number_of_future = platform.additional_data_size(measurement_name, tests)
+    qc_inputs = [as_columnar(qc_input) for qc_input in qc_inputs]
+    # concatenate only keeps the locations when all the inputs have them
+    with_locations = {qc_input.has_locations and len(qc_input.longitudes) == len(qc_input) for qc_input in qc_inputs}
+    if number_of_historical or number_of_future or len(qc_inputs) < 2 or len(with_locations) > 1:
+        return [execute(platform, qc_input, measurement_name, tests, as_array=as_array) for qc_input in qc_inputs]
+
+    for qc_input in qc_inputs:
+        assert_is_sorted(qc_input)
+    qc_inputs_without_none_values = [remove_nans(qc_input) for qc_input in qc_inputs]
+    concatenated = ColumnarQCInput.concatenate(qc_inputs_without_none_values)
+    if len(concatenated):
+        concatenated_flags = platform.applyQC(concatenated, measurement_name, tests, as_array=True)
+    all_flags = []
+    start = 0
+    for qc_input, qc_input_without_none_values in zip(qc_inputs, qc_inputs_without_none_values):
+        stop = start + len(qc_input_without_none_values)
+        if stop > start:
+            flags = _flags_of_all_rows({test: concatenated_flags[test][start:stop] for test in tests}, qc_input,
+                                       qc_input_without_none_values)
+        else:
+            flags = {test: empty_flags(len(qc_input), NO_DATA) for test in tests}
+        all_flags.append(flags if as_array else _as_lists(flags))
+        start = stop
+    return all_flags
+
+
+def execute_chunked(platform: PlatformQC, qc_input: QCInputLike, measurement_name: str, tests: List[str],
+                    chunk_size: int = DEFAULT_CHUNK_SIZE, executor: Optional[Executor] = None,
+                    as_array: bool = False) -> Dict[str, FlagsLike]:
+    """
+    Same flags as QC.execute, computed on consecutive chunks of chunk_size points with a value. Every chunk is padded
+    with the historical and future points the tests need (PlatformQC.additional_data_size), so the flags of its own
+    points are the ones of a single pass. With an executor the chunks run concurrently, e.g. in a ProcessPoolExecutor
+    to use several cores on a long series.
+    """
+    qc_input = as_columnar(qc_input)
     assert_is_sorted(qc_input)
     qc_input_without_none_values = remove_nans(qc_input)
-    if qc_input_without_none_values.values:
-        flags = platform.applyQC(qc_input=qc_input_without_none_values, measurement_name=measurement_name, tests=tests)
+    if not len(qc_input_without_none_values):
+        flags = {test: empty_flags(len(qc_input), NO_DATA) for test in tests}
+        return flags if as_array else _as_lists(flags)
+
+    number_of_historical, number_of_future = platform.additional_data_size(measurement_name, tests)
+    # chunks shorter than the history would let the tests fall back to shorter windows
+    chunk_size = max(chunk_size, number_of_historical, 1)
+    size = len(qc_input_without_none_values)
+    chunks = []
+    for start in range(0, size, chunk_size):
+        padded_start = max(start - number_of_historical, 0)
+        padded_stop = min(start + chunk_size + number_of_future, size)
+        chunk = qc_input_without_none_values[padded_start:padded_stop]
+        if executor is None:
+            chunk_flags = platform.applyQC(qc_input=chunk, measurement_name=measurement_name, tests=tests,
+                                           as_array=True)
+        else:
+            chunk_flags = executor.submit(platform.applyQC, chunk, measurement_name, tests, as_array=True)
+        chunks.append((start, start - padded_start, min(chunk_size, size - start), chunk_flags))
+
+    flags = {test: empty_flags(size) for test in tests}
+    for start, offset, length, chunk_flags in chunks:
+        if executor is not None:
+            chunk_flags = chunk_flags.result()
+        for test in tests:
+            flags[test][start:start + length] = chunk_flags[test][offset:offset + length]
+    flags = _flags_of_all_rows(flags, qc_input, qc_input_without_none_values)
+    return flags if as_array else _as_lists(flags)
+
+
+def execute_segmented(platform: PlatformQC, qc_input: QCInputLike, measurement_name: str, tests: List[str],
+                      chunk_size: int = DEFAULT_CHUNK_SIZE, executor: Optional[Executor] = None,
+                      as_array: bool = False) -> Dict[str, FlagsLike]:
+    """
+    Same flags as QC.execute on series made of segments separated by long gaps, e.g. the dives of a glider. The points
+    with a value are split at the time steps larger than the accept_time_difference of the platform, which the windows
+    of its tests do not span. Whole segments are grouped in chunks of at least chunk_size points that are processed
+    independently, without the historical and future points execute_chunked adds. With an executor the chunks run
+    concurrently.
+    Raises ValueError when the windows of one of the tests may span these gaps: the platform has no
+    accept_time_difference, or a window test has no max_gap or a larger one.
+    """
+    max_gap = _segment_gap(platform, measurement_name, tests)
+    qc_input = as_columnar(qc_input)
+    assert_is_sorted(qc_input)
+    qc_input_without_none_values = remove_nans(qc_input)
+    if not len(qc_input_without_none_values):
+        flags = {test: empty_flags(len(qc_input), NO_DATA) for test in tests}
+        return flags if as_array else _as_lists(flags)
+
+    # chunks shorter than the history would let the tests fall back to shorter windows
+    number_of_historical, _ = platform.additional_data_size(measurement_name, tests)
+    chunk_size = max(chunk_size, number_of_historical, 1)
+    size = len(qc_input_without_none_values)
+    boundaries = [0]
+    for start in segment_index(qc_input_without_none_values, max_gap).starts[1:].tolist():
+        if start - boundaries[-1] >= chunk_size:
+            boundaries.append(start)
+    # the last chunk is merged into the previous one when it is too short
+    if len(boundaries) > 1 and size - boundaries[-1] < chunk_size:
+        boundaries.pop()
+    boundaries.append(size)
+
+    chunks = []
+    for start, stop in zip(boundaries[:-1], boundaries[1:]):
+        chunk = qc_input_without_none_values[start:stop]
+        if executor is None:
+            chunk_flags = platform.applyQC(qc_input=chunk, measurement_name=measurement_name, tests=tests,
+                                           as_array=True)
+        else:
+            chunk_flags = executor.submit(platform.applyQC, chunk, measurement_name, tests, as_array=True)
+        chunks.append((start, stop, chunk_flags))
+
+    flags = {test: empty_flags(size) for test in tests}
+    for start, stop, chunk_flags in chunks:
+        if executor is not None:
+            chunk_flags = chunk_flags.result()
+        for test in tests:
+            flags[test][start:stop] = chunk_flags[test]
+    flags = _flags_of_all_rows(flags, qc_input, qc_input_without_none_values)
+    return flags if as_array else _as_lists(flags)
+
+
+def _segment_gap(platform: PlatformQC, measurement_name: str, tests: List[str]) -> float:
+    """accept_time_difference of platform, checked against the max_gap of the window tests"""
+    max_gap = platform.accept_time_difference
+    if max_gap is None:
+        raise ValueError(f"{type(platform).__name__} has no accept_time_difference to split the series at")
+    for step in platform.plan(measurement_name, tests).steps:
+        function = getattr(step.function, 'combined_function', step.function)
+        if not (getattr(function, 'number_of_historical', 0) or getattr(function, 'number_of_future', 0)):
+            continue
+        for options in getattr(step.function, 'options', (step.kwargs,)):
+            if options.get('max_gap') is None or options['max_gap'] > max_gap:
+                raise ValueError(f"The windows of {step.name} may span gaps larger than the accept_time_difference "
+                                 f"of {type(platform).__name__}: max_gap {options.get('max_gap')}")
+    return max_gap
+
+
+def _execute_without_none_values(platform: PlatformQC, qc_input: ColumnarQCInput,
+                                 qc_input_without_none_values: ColumnarQCInput, measurement_name: str,
+                                 tests: List[str], executor: Optional[Executor] = None,
+                                 metrics: Optional[QCMetrics] = None) -> Dict[str, np.ndarray]:
+    if len(qc_input_without_none_values):
+        flags = platform.applyQC(qc_input=qc_input_without_none_values, measurement_name=measurement_name, tests=tests,
+                                 executor=executor, as_array=True, metrics=metrics)
     else:
-        return {test: [None] * len(qc_input.values) for test in tests}
-    if len(qc_input.values) == len(qc_input_without_none_values.values):
+        return {test: empty_flags(len(qc_input), NO_DATA) for test in tests}
+    return measured(metrics, 'flags_of_all_rows', measurement_name, len(qc_input), _flags_of_all_rows, flags, qc_input,
+                    qc_input_without_none_values)
+
+
+def _flags_of_all_rows(flags: Dict[str, np.ndarray], qc_input: ColumnarQCInput,
+                       qc_input_without_none_values: ColumnarQCInput) -> Dict[str, np.ndarray]:
+    if len(qc_input) == len(qc_input_without_none_values):
         return flags
-    elif len(qc_input.values) > len(qc_input_without_none_values.values):
-        return flags_resized_to_include_values_for_nan(flags, qc_input)
+    elif len(qc_input) > len(qc_input_without_none_values):
+        return flag_arrays_resized_to_include_no_data(flags, qc_input)
     else:
         logging.error(f"inconsistent input data")
 
 
+def _as_lists(flags: Optional[Dict[str, np.ndarray]]) -> Optional[Dict[str, List[Optional[int]]]]:
+    return None if flags is None else {test: flags_to_list(flag) for test, flag in flags.items()}
+
+
 def finalize():
     print("Successfully run QC")
     pass
@@ -0,0 +1,224 @@
+"""
+QC of files larger than memory: the file is read in batches of rows, the tests run on each batch with the historical
+points of the previous batches (see QCStream) and the flags are written to the output file batch by batch.
+
+CSV files are read with pandas, Parquet (.parquet) and Arrow IPC (.arrow, .feather) files need pyarrow.
+"""
+import os
+import pickle
+import tempfile
+from collections import deque
+from typing import IO, Deque, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from qclib.PlatformQC import PlatformQC
+from qclib.QCPandas import flag_column_name, flags_to_int8_array
+from qclib.QCStream import QCStream
+from qclib.utils.flags import empty_flags
+from qclib.utils.qc_input import ColumnarQCInput
+from qclib.utils.validate_input import assert_is_sorted
+
+DEFAULT_BATCH_SIZE = 100000
+
+PARQUET_SUFFIXES = ('.parquet', '.pq')
+ARROW_SUFFIXES = ('.arrow', '.feather', '.ipc')
+
+# column of the pending flags of a test
+_FLAG = 'flag'
+
+
+def execute_file(platform: PlatformQC, source: str, destination: str, tests: Dict[str, List[str]],
+                 time_column: str = 'time', value_columns: Optional[Dict[str, str]] = None,
+                 longitude_column: Optional[str] = None, latitude_column: Optional[str] = None,
+                 batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Runs the tests of each measurement, tests = {measurement_name: [test, ...]}, on the rows of source, sorted by
+    time_column, and writes the rows of source with one flag column per test, named '<measurement_name>_<test>', to
+    destination. Values are read from value_columns[measurement_name], by default the column named as the
+    measurement. NaN values are not tested, their flags are missing like the None flags of QC.execute.
+    Only a batch of rows, and the few points the tests need around it, is held in memory: the rows that wait for the
+    flags of an earlier point, and the flags known for them, are moved to a temporary file beyond batch_size rows.
+    The flags are the same as QC.execute on the whole file. Returns the number of rows written.
+    """
+    value_columns = value_columns or {}
+    streams = {measurement_name: QCStream(platform, measurement_name, measurement_tests)
+               for measurement_name, measurement_tests in tests.items()}
+    # rows that have been read but not written yet, and the flags that are known for them, oldest first
+    pending_rows = _PendingRows(batch_size)
+    pending_flags: Dict[Tuple[str, str], _PendingRows] = \
+        {(measurement_name, test): _PendingRows(batch_size) for measurement_name, measurement_tests in tests.items()
+         for test in measurement_tests}
+    writer = _BatchWriter(destination)
+    try:
+        for batch in read_batches(source, batch_size):
+            axis = _axis(batch, time_column, longitude_column, latitude_column)
+            for measurement_name, stream in streams.items():
+                values = batch[value_columns.get(measurement_name, measurement_name)].to_numpy(dtype=np.float64)
+                for test, flags in stream.append(axis.with_values(values), as_array=True).items():
+                    pending_flags[(measurement_name, test)].append(pd.DataFrame({_FLAG: flags}))
+            pending_rows.append(batch)
+            _write_rows_with_flags(writer, pending_rows, pending_flags)
+
+        for measurement_name, stream in streams.items():
+            for test, flags in stream.flush(as_array=True).items():
+                pending_flags[(measurement_name, test)].append(pd.DataFrame({_FLAG: flags}))
+        _write_rows_with_flags(writer, pending_rows, pending_flags)
+    finally:
+        writer.close()
+        pending_rows.close()
+        for test_flags in pending_flags.values():
+            test_flags.close()
+    return writer.number_of_rows
+
+
+def read_batches(path: str, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[pd.DataFrame]:
+    """Rows of a CSV, Parquet or Arrow IPC file, batch_size rows at a time"""
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix in PARQUET_SUFFIXES:
+        parquet = _import_pyarrow('parquet')
+        for record_batch in parquet.ParquetFile(path).iter_batches(batch_size=batch_size):
+            yield record_batch.to_pandas()
+    elif suffix in ARROW_SUFFIXES:
+        ipc = _import_pyarrow('ipc')
+        with ipc.open_file(path) as reader:
+            for index in range(reader.num_record_batches):
+                record_batch = reader.get_batch(index)
+                for start in range(0, record_batch.num_rows, batch_size):
+                    yield record_batch.slice(start, batch_size).to_pandas()
+    else:
+        for frame in pd.read_csv(path, chunksize=batch_size):
+            yield frame
+
+
+def _axis(batch: pd.DataFrame, time_column: str, longitude_column: Optional[str],
+          latitude_column: Optional[str]) -> ColumnarQCInput:
+    timestamps = pd.to_datetime(batch[time_column])
+    if timestamps.dt.tz is not None:
+        timestamps = timestamps.dt.tz_convert('UTC').dt.tz_localize(None)
+    longitudes = None if longitude_column is None else batch[longitude_column].to_numpy(dtype=np.float64)
+    latitudes = None if latitude_column is None else batch[latitude_column].to_numpy(dtype=np.float64)
+    axis = ColumnarQCInput(timestamps.to_numpy(dtype='datetime64[ns]'), np.zeros(len(batch)), longitudes, latitudes)
+    if len(axis):
+        assert_is_sorted(axis)
+    return axis
+
+
+def _write_rows_with_flags(writer: '_BatchWriter', rows: '_PendingRows', flags: Dict[Tuple[str, str], '_PendingRows']):
+    """Writes the rows whose flags are known for every test and removes them and their flags"""
+    number_of_final = min([len(test_flags) for test_flags in flags.values()], default=len(rows))
+    for frame in rows.pop(number_of_final):
+        frame = frame.copy()
+        for key, test_flags in flags.items():
+            frame[flag_column_name(*key)] = flags_to_int8_array(
+                np.concatenate([empty_flags(0)] + [chunk[_FLAG].to_numpy() for chunk in test_flags.pop(len(frame))]))
+        writer.write(frame)
+
+
+class _PendingRows:
+    """
+    Rows read but not written yet, or the flags of a test for them, oldest first. Once max_rows_in_memory rows are
+    pending, the next rows are kept in a temporary file until the first ones are written: the rows after a point whose
+    flags depend on the next value of its measurement, e.g. of a sensor without values until the end of the file, are
+    not all held in memory.
+    """
+
+    def __init__(self, max_rows_in_memory: int):
+        self.max_rows_in_memory = max_rows_in_memory
+        self._frames: Deque[pd.DataFrame] = deque()
+        self._number_of_rows_in_memory = 0
+        # data frames pickled one after the other, read back from _read_position
+        self._file: Optional[IO[bytes]] = None
+        self._read_position = 0
+        self._number_of_rows_in_file = 0
+
+    def __len__(self) -> int:
+        return self._number_of_rows_in_memory + self._number_of_rows_in_file
+
+    @property
+    def number_of_rows_in_memory(self) -> int:
+        return self._number_of_rows_in_memory
+
+    def append(self, frame: pd.DataFrame):
+        if self._file is None and self._number_of_rows_in_memory + len(frame) <= self.max_rows_in_memory:
+            self._frames.append(frame)
+            self._number_of_rows_in_memory += len(frame)
+            return
+        # rows already in the file have to be read before this one
+        if self._file is None:
+            self._file = tempfile.TemporaryFile()
+        self._file.seek(0, os.SEEK_END)
+        pickle.dump(frame, self._file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._number_of_rows_in_file += len(frame)
+
+    def pop(self, number_of_rows: int) -> Iterator[pd.DataFrame]:
+        """Removes the first number_of_rows rows and yields them, a data frame at a time"""
+        while number_of_rows > 0:
+            if not self._frames:
+                self._load()
+            frame = self._frames.popleft()
+            if len(frame) > number_of_rows:
+                self._frames.appendleft(frame.iloc[number_of_rows:].reset_index(drop=True))
+                frame = frame.iloc[:number_of_rows]
+            self._number_of_rows_in_memory -= len(frame)
+            number_of_rows -= len(frame)
+            yield frame
+
+    def _load(self):
+        self._file.seek(self._read_position)
+        frame = pickle.load(self._file)
+        self._read_position = self._file.tell()
+        self._number_of_rows_in_file -= len(frame)
+        self._frames.append(frame)
+        self._number_of_rows_in_memory += len(frame)
+        if self._number_of_rows_in_file == 0:
+            self.close()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._read_position = 0
+
+
+class _BatchWriter:
+    """Appends data frames to a CSV, Parquet or Arrow IPC file, the file is created by the first write"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.suffix = os.path.splitext(path)[1].lower()
+        self.number_of_rows = 0
+        self._writer = None
+
+    def write(self, frame: pd.DataFrame):
+        if self.suffix in PARQUET_SUFFIXES or self.suffix in ARROW_SUFFIXES:
+            pyarrow = _import_pyarrow()
+            table = pyarrow.Table.from_pandas(frame, preserve_index=False)
+            if self._writer is None:
+                if self.suffix in PARQUET_SUFFIXES:
+                    self._writer = _import_pyarrow('parquet').ParquetWriter(self.path, table.schema)
+                else:
+                    self._writer = _import_pyarrow('ipc').new_file(self.path, table.schema)
+            self._writer.write_table(table)
+        else:
+            frame.to_csv(self.path, mode='w' if self.number_of_rows == 0 else 'a', header=self.number_of_rows == 0,
+                         index=False)
+        self.number_of_rows += len(frame)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+def _import_pyarrow(module: Optional[str] = None):
+    try:
+        import pyarrow
+        if module == 'parquet':
+            import pyarrow.parquet
+        elif module == 'ipc':
+            import pyarrow.ipc
+    except ImportError as e:
+        raise ImportError("pyarrow is needed to read and write Parquet and Arrow files: pip install pyarrow") from e
+    return pyarrow if module is None else getattr(pyarrow, module)
@@ -0,0 +1,131 @@
+"""
+Instrumentation of QC.execute and PlatformQC.applyQC. Both take a metrics sink, a callable given one QCMeasurement
+per stage (input conversion, sort check, removal of the missing values, every test, ...):
+
+    metrics = QCMetricsAggregator()
+    flags = QC.execute(platform, qc_input, "temperature", tests, metrics=metrics)
+    metrics.dump()
+
+Without a sink (metrics=None, the default) nothing is measured. The memory allocated by a stage is only measured
+while tracemalloc is tracing, and is not meaningful when the tests run concurrently in threads.
+"""
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Callable, Dict, List, NamedTuple, Optional, TextIO, Tuple
+
+import numpy as np
+
+
+class QCMeasurement(NamedTuple):
+    # 'execute', 'as_columnar', 'assert_is_sorted', 'remove_nans', 'applyQC', 'test', 'flags_of_all_rows', 'as_lists'
+    stage: str
+    # measurement name, or test name for the 'test' stage
+    name: str
+    # number of points of the input of the stage
+    size: int
+    seconds: float
+    # peak of the memory allocated during the stage, None when tracemalloc is not tracing
+    allocated_bytes: Optional[int]
+
+
+QCMetrics = Callable[[QCMeasurement], None]
+
+# peak traced memory of the stages being measured in this thread, outermost first
+_peaks = threading.local()
+
+
+def timed(function: Callable, *args, **kwargs) -> Tuple[object, float, Optional[int]]:
+    """
+    function(*args, **kwargs), its wall time and the peak memory it allocated. Nested calls share the tracemalloc
+    peak: it is reset at the start of every call and the peaks seen so far are carried to the enclosing call.
+    """
+    if not tracemalloc.is_tracing():
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        return result, time.perf_counter() - start, None
+
+    stack = _peaks.__dict__.setdefault('stack', [])
+    if stack:
+        stack[-1] = max(stack[-1], tracemalloc.get_traced_memory()[1])
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    stack.append(current)
+    start = time.perf_counter()
+    try:
+        result = function(*args, **kwargs)
+    finally:
+        seconds = time.perf_counter() - start
+        peak = max(stack.pop(), tracemalloc.get_traced_memory()[1])
+        if stack:
+            stack[-1] = max(stack[-1], peak)
+    return result, seconds, peak - current
+
+
+def measured(metrics: Optional[QCMetrics], stage: str, name: str, size: int, function: Callable, *args, **kwargs):
+    """function(*args, **kwargs), recorded in metrics as one measurement of stage when metrics is not None"""
+    if metrics is None:
+        return function(*args, **kwargs)
+    result, seconds, allocated_bytes = timed(function, *args, **kwargs)
+    metrics(QCMeasurement(stage, name, size, seconds, allocated_bytes))
+    return result
+
+
+class QCMetricsAggregator:
+    """Metrics sink keeping the measurements of every (stage, name), e.g. every test, to summarize them"""
+
+    def __init__(self):
+        self.measurements: Dict[Tuple[str, str], List[QCMeasurement]] = {}
+
+    def __call__(self, measurement: QCMeasurement):
+        self.measurements.setdefault((measurement.stage, measurement.name), []).append(measurement)
+
+    def clear(self):
+        self.measurements.clear()
+
+    def seconds(self, stage: str, name: str) -> np.ndarray:
+        return np.array([measurement.seconds for measurement in self.measurements.get((stage, name), [])])
+
+    def histogram(self, stage: str, name: str, bins: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+        """Counts and edges of the wall times in seconds, in bins of equal width on a log scale"""
+        seconds = self.seconds(stage, name)
+        if not len(seconds):
+            return np.zeros(bins, dtype=int), np.zeros(bins + 1)
+        low, high = np.log10(max(seconds.min(), 1e-9)), np.log10(max(seconds.max(), 1e-9))
+        edges = np.logspace(low, max(high, low + 1e-3), bins + 1)
+        # 10 ** log10(x) may not be exactly x
+        edges[0], edges[-1] = min(edges[0], seconds.min()), max(edges[-1], seconds.max())
+        return np.histogram(seconds, bins=edges)
+
+    def summary(self) -> Dict[Tuple[str, str], Dict[str, float]]:
+        """Number of calls, total and percentiles of the wall time, points per second and peak memory"""
+        summary = {}
+        for (stage, name), measurements in self.measurements.items():
+            seconds = np.array([measurement.seconds for measurement in measurements])
+            allocated = [measurement.allocated_bytes for measurement in measurements
+                         if measurement.allocated_bytes is not None]
+            total = seconds.sum()
+            summary[(stage, name)] = {
+                'count': len(measurements),
+                'total_seconds': total,
+                'median_seconds': np.median(seconds),
+                'p99_seconds': np.percentile(seconds, 99),
+                'max_seconds': seconds.max(),
+                'points_per_second': sum(measurement.size for measurement in measurements) / total if total else 0.,
+                'max_allocated_bytes': max(allocated) if allocated else None}
+        return summary
+
+    def dump(self, file: TextIO = sys.stdout, bins: int = 10):
+        """Summary and histogram of the wall times of every (stage, name)"""
+        for (stage, name), summary in self.summary().items():
+            allocated = summary['max_allocated_bytes']
+            print(f"{stage} {name}: {summary['count']} calls, {summary['total_seconds'] * 1000:.3f} ms, "
+                  f"median {summary['median_seconds'] * 1000:.3f} ms, p99 {summary['p99_seconds'] * 1000:.3f} ms, "
+                  f"{summary['points_per_second'] / 1e6:.2f} M points/s"
+                  + ("" if allocated is None else f", max {allocated / 1e6:.2f} MB allocated"), file=file)
+            counts, edges = self.histogram(stage, name, bins)
+            for count, low, high in zip(counts, edges[:-1], edges[1:]):
+                if count:
+                    print(f"  {low * 1000:10.3f} - {high * 1000:10.3f} ms {count:6d} {'#' * min(count, 50)}",
+                          file=file)
@@ -0,0 +1,78 @@
+"""
+QC of pandas data frames indexed by time, without converting them to QCInput. Importing this module registers the
+`qc` accessor of DataFrame:
+
+    import qclib.QCPandas
+    flags = frame.qc.flags(QC.init('TF'), {"temperature": ["global_range_test", "local_range_test"]})
+"""
+from concurrent.futures import Executor
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from qclib import QC
+from qclib.PlatformQC import PlatformQC
+from qclib.utils.flags import NO_DATA
+
+LONGITUDE_COLUMN = 'lon'
+LATITUDE_COLUMN = 'lat'
+
+
+def flag_column_name(measurement_name: str, test: str) -> str:
+    return f"{measurement_name}_{test}"
+
+
+def flags_to_int8_array(flags: np.ndarray) -> pd.arrays.IntegerArray:
+    """Nullable Int8 array of int8 flags, missing where the flags are NO_DATA, without copying the flags"""
+    return pd.arrays.IntegerArray(flags, flags == NO_DATA)
+
+
+def qc_flags(frame: pd.DataFrame, platform: PlatformQC, tests: Dict[str, List[str]],
+             value_columns: Optional[Dict[str, str]] = None, longitude_column: str = LONGITUDE_COLUMN,
+             latitude_column: str = LATITUDE_COLUMN, executor: Optional[Executor] = None) -> pd.DataFrame:
+    """
+    Flags of the tests of each measurement, tests = {measurement_name: [test, ...]}, on a frame with a sorted
+    DatetimeIndex. Values are read from value_columns[measurement_name], by default the column named as the
+    measurement, NaN values are not tested. Locations are read from the longitude and latitude columns when the frame
+    has them. Returns a frame with the same index and one Int8 column '<measurement_name>_<test>' per test, missing
+    where QC.execute gives None.
+    """
+    if not isinstance(frame.index, pd.DatetimeIndex):
+        raise ValueError("The data frame has to be indexed by a DatetimeIndex")
+    index = frame.index if frame.index.tz is None else frame.index.tz_convert('UTC').tz_localize(None)
+    value_columns = value_columns or {}
+    has_locations = longitude_column in frame.columns and latitude_column in frame.columns
+    flags = QC.execute_many(platform,
+                            index.to_numpy(dtype='datetime64[ns]'),
+                            {measurement_name: frame[value_columns.get(measurement_name, measurement_name)].to_numpy(
+                                dtype=np.float64) for measurement_name in tests},
+                            tests,
+                            longitudes=frame[longitude_column].to_numpy(dtype=np.float64) if has_locations else None,
+                            latitudes=frame[latitude_column].to_numpy(dtype=np.float64) if has_locations else None,
+                            executor=executor,
+                            as_array=True)
+    return pd.DataFrame({flag_column_name(measurement_name, test): flags_to_int8_array(test_flags)
+                         for measurement_name, measurement_flags in flags.items()
+                         for test, test_flags in measurement_flags.items()},
+                        index=frame.index)
+
+
+def add_qc_flags(frame: pd.DataFrame, platform: PlatformQC, tests: Dict[str, List[str]], **options) -> pd.DataFrame:
+    """Copy of frame with the flag columns of qc_flags added, options are the ones of qc_flags"""
+    flags = qc_flags(frame, platform, tests, **options)
+    return frame.assign(**{column: flags[column] for column in flags.columns})
+
+
+@pd.api.extensions.register_dataframe_accessor("qc")
+class QCAccessor:
+    """frame.qc.flags(...) and frame.qc.add_flags(...), see qc_flags and add_qc_flags"""
+
+    def __init__(self, frame: pd.DataFrame):
+        self._frame = frame
+
+    def flags(self, platform: PlatformQC, tests: Dict[str, List[str]], **options) -> pd.DataFrame:
+        return qc_flags(self._frame, platform, tests, **options)
+
+    def add_flags(self, platform: PlatformQC, tests: Dict[str, List[str]], **options) -> pd.DataFrame:
+        return add_qc_flags(self._frame, platform, tests, **options)
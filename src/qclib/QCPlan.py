@@ -0,0 +1,143 @@
+import functools
+import logging
+from concurrent.futures import Executor
+from types import MappingProxyType
+from typing import Callable, Dict, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+from qclib.QCMetrics import QCMeasurement, QCMetrics, timed
+from qclib.QCTests import QCTests
+from qclib.utils.flags import FlagsLike, flags_to_array
+from qclib.utils.qc_input import ColumnarQCInput, QCInputLike
+from qclib.utils.qc_input_helpers import as_columnar, as_qc_input
+
+DEFAULT_PLAN_CACHE_SIZE = 256
+
+
+class QCStep(NamedTuple):
+    """One test of a plan: flags[name] = function(qc_input, **kwargs)"""
+    name: str
+    function: Callable
+    kwargs: Mapping
+
+
+class QCPlan:
+    """
+    The tests of one measurement resolved from a qc_tests dictionary of a platform, compiled once and then executed on
+    any number of inputs. A plan is immutable, the test options it refers to must not be modified.
+    """
+    __slots__ = ('measurement_name', 'steps', 'number_of_historical', 'number_of_future')
+
+    def __init__(self, measurement_name: str, steps: Sequence[QCStep]):
+        object.__setattr__(self, 'measurement_name', measurement_name)
+        object.__setattr__(self, 'steps', tuple(steps))
+        functions = [getattr(step.function, 'combined_function', step.function) for step in self.steps]
+        object.__setattr__(self, 'number_of_historical',
+                           max([getattr(function, 'number_of_historical', 0) for function in functions], default=0))
+        object.__setattr__(self, 'number_of_future',
+                           max([getattr(function, 'number_of_future', 0) for function in functions], default=0))
+
+    def __setattr__(self, key, value):
+        raise AttributeError("QCPlan is immutable")
+
+    @property
+    def tests(self) -> Tuple[str, ...]:
+        return tuple(step.name for step in self.steps)
+
+    @classmethod
+    def compile(cls, qc_tests: Dict, measurement_name: str, tests: Sequence[str],
+                combine: Callable[..., FlagsLike]) -> 'QCPlan':
+        """
+        qc_tests is a dictionary {measurement_name: {test: [function, options]}}. Options given as a list are the
+        options of several runs of the function, whose flags are combined with combine(flags, as_array). For
+        local_range_test they are range_test options, its thresholds.
+        """
+        if measurement_name not in qc_tests:
+            logging.debug(f"'{measurement_name}' is not defined in qc_tests, using default tests instead")
+            measurement_name = "*"
+        steps = []
+        for test in tests:
+            if test not in qc_tests[measurement_name]:
+                raise Exception(f"This test: '{test}' is not available for this measurement '{measurement_name}'")
+            function, options = qc_tests[measurement_name][test][:2]
+            if type(options) is list and getattr(function, '__func__', None) is QCTests.local_range_test.__func__:
+                steps.append(QCStep(test, function, MappingProxyType({'thresholds': list(options)})))
+            elif type(options) is list:
+                steps.append(QCStep(test, _CombinedTest(function, tuple(options), combine), MappingProxyType({})))
+            else:
+                steps.append(QCStep(test, function, MappingProxyType(dict(options))))
+        return cls(measurement_name, steps)
+
+    def execute(self, qc_input: QCInputLike, executor: Optional[Executor] = None,
+                as_array: bool = False, metrics: Optional[QCMetrics] = None) -> Dict[str, FlagsLike]:
+        """
+        The tests are independent, with an executor they run concurrently: a ThreadPoolExecutor suits the tests that
+        spend their time in NumPy, a ProcessPoolExecutor the others. The flags are the same either way, lists or int8
+        arrays with as_array.
+        With metrics, every test is recorded as a 'test' QCMeasurement, see QCMetrics.
+        """
+        qc_input = as_columnar(qc_input)
+        if metrics is not None:
+            return self._execute_measured(qc_input, executor, as_array, metrics)
+        if executor is None:
+            return {step.name: _run_test(step.function, qc_input, as_array, **step.kwargs) for step in self.steps}
+        futures = [executor.submit(_run_test, step.function, qc_input, as_array, **step.kwargs) for step in self.steps]
+        return {step.name: future.result() for step, future in zip(self.steps, futures)}
+
+    def _execute_measured(self, qc_input: ColumnarQCInput, executor: Optional[Executor], as_array: bool,
+                          metrics: QCMetrics) -> Dict[str, FlagsLike]:
+        # the tests are timed where they run, the measurements are recorded in this thread
+        if executor is None:
+            results = [timed(_run_test, step.function, qc_input, as_array, **step.kwargs) for step in self.steps]
+        else:
+            results = [future.result() for future in [
+                executor.submit(timed, _run_test, step.function, qc_input, as_array, **step.kwargs)
+                for step in self.steps]]
+        flags = {}
+        for step, (step_flags, seconds, allocated_bytes) in zip(self.steps, results):
+            metrics(QCMeasurement('test', step.name, len(qc_input), seconds, allocated_bytes))
+            flags[step.name] = step_flags
+        return flags
+
+
+class _CombinedTest:
+    """Runs a test once per options and combines the flags. A class rather than a closure so that it can be pickled"""
+
+    def __init__(self, function: Callable, options: Tuple[Dict, ...], combine: Callable):
+        self.combined_function = function
+        self.options = options
+        self.combine = combine
+
+    def __call__(self, qc_input: QCInputLike, as_array: bool = False) -> FlagsLike:
+        return self.combine([_run_test(self.combined_function, qc_input, True, **kwargs) for kwargs in self.options],
+                            as_array=as_array)
+
+
+def _run_test(function: Callable, qc_input: ColumnarQCInput, as_array: bool, **kwargs) -> FlagsLike:
+    # only the tests of QCTests (qctest_additional_data_size) take a ColumnarQCInput and as_array, other tests are
+    # given a QCInput as before and their flags are converted
+    if isinstance(function, _CombinedTest) or hasattr(function, 'number_of_historical'):
+        return function(qc_input, as_array=as_array, **kwargs)
+    flags = function(as_qc_input(qc_input), **kwargs)
+    return flags_to_array(flags) if as_array else flags
+
+
+def _compile_default_plan(platform_class: type, measurement_name: str, tests: Tuple[str, ...]) -> QCPlan:
+    return QCPlan.compile(platform_class.default_qc_tests(), measurement_name, tests, platform_class.get_combined_flag)
+
+
+_cached_default_plan = functools.lru_cache(maxsize=DEFAULT_PLAN_CACHE_SIZE)(_compile_default_plan)
+
+
+def get_plan(platform_class: type, measurement_name: str, tests: Sequence[str]) -> QCPlan:
+    """Plan of the default tests of a platform class, compiled once per (platform class, measurement, tests)"""
+    return _cached_default_plan(platform_class, measurement_name, tuple(tests))
+
+
+def set_plan_cache_size(maxsize: int):
+    """Number of plans kept by get_plan, least recently used plans are dropped first. Clears the cache."""
+    global _cached_default_plan
+    _cached_default_plan = functools.lru_cache(maxsize=maxsize)(_compile_default_plan)
+
+
+def clear_plan_cache():
+    _cached_default_plan.cache_clear()
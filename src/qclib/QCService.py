@@ -0,0 +1,110 @@
+"""
+asyncio front end of QC.init and QC.execute for services. The QC runs in an executor instead of blocking the event
+loop, and small concurrent requests for the same (platform, measurement, tests) are coalesced into one
+QC.execute_batch:
+
+    service = QCService()
+    flags = await service.execute('TF', qc_input, "temperature", ["global_range_test", "local_range_test"])
+
+Requests are only coalesced when their tests look at one point at a time, the flags are then the same as the flags
+of QC.execute on each request. The others run one by one in the executor.
+"""
+import asyncio
+import functools
+from concurrent.futures import Executor
+from typing import Dict, List, Optional, Set, Tuple
+
+from qclib import QC
+from qclib.PlatformQC import PlatformQC
+from qclib.utils.flags import FlagsLike, flags_to_list
+from qclib.utils.qc_input import QCInputLike
+
+DEFAULT_BATCH_DELAY = 0.002
+DEFAULT_MAX_BATCH_SIZE = 100000
+
+
+class _Batch:
+    """Requests waiting to be executed together"""
+
+    def __init__(self):
+        self.requests: List[Tuple[QCInputLike, bool, asyncio.Future]] = []
+        self.size = 0
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class QCService:
+    """
+    executor runs the QC, by default the default executor of the event loop (threads). A batch is executed batch_delay
+    seconds after its first request or as soon as it holds max_batch_size points, larger requests are not coalesced.
+    """
+
+    def __init__(self, executor: Optional[Executor] = None, batch_delay: float = DEFAULT_BATCH_DELAY,
+                 max_batch_size: int = DEFAULT_MAX_BATCH_SIZE):
+        self.executor = executor
+        self.batch_delay = batch_delay
+        self.max_batch_size = max_batch_size
+        self._batches: Dict[Tuple[str, str, Tuple[str, ...]], _Batch] = {}
+        # batches being executed, referenced until they are done
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def execute(self, platform_code: str, qc_input: QCInputLike, measurement_name: str, tests: List[str],
+                      as_array: bool = False) -> Dict[str, FlagsLike]:
+        """Flags of QC.execute(QC.init(platform_code), qc_input, measurement_name, tests, as_array=as_array)"""
+        platform = QC.init(platform_code)
+        number_of_historical, number_of_future = platform.additional_data_size(measurement_name, tests)
+        size = len(qc_input.values)
+        if number_of_historical or number_of_future or size >= self.max_batch_size:
+            return await self._run(QC.execute, platform, qc_input, measurement_name, list(tests), as_array=as_array)
+
+        key = (platform_code, measurement_name, tuple(tests))
+        if key not in self._batches:
+            self._batches[key] = _Batch()
+            self._batches[key].timer = asyncio.get_running_loop().call_later(self.batch_delay, self._flush, key)
+        batch = self._batches[key]
+        future = asyncio.get_running_loop().create_future()
+        batch.requests.append((qc_input, as_array, future))
+        batch.size += size
+        if batch.size >= self.max_batch_size:
+            self._flush(key)
+        return await future
+
+    async def _run(self, function, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(self.executor,
+                                                                functools.partial(function, *args, **kwargs))
+
+    def _flush(self, key: Tuple[str, str, Tuple[str, ...]]):
+        batch = self._batches.pop(key, None)
+        if batch is None:
+            return
+        batch.timer.cancel()
+        task = asyncio.get_running_loop().create_task(self._execute_batch(key, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _execute_batch(self, key: Tuple[str, str, Tuple[str, ...]], batch: _Batch):
+        platform_code, measurement_name, tests = key
+        platform = QC.init(platform_code)
+        qc_inputs = [qc_input for qc_input, _, _ in batch.requests]
+        as_arrays = [as_array for _, as_array, _ in batch.requests]
+        try:
+            results = await self._run(_execute_batch, platform, qc_inputs, measurement_name, list(tests), as_arrays)
+        except Exception:
+            # one of the inputs is invalid, each request gets the result of its own input
+            results = await asyncio.gather(*[self._run(QC.execute, platform, qc_input, measurement_name, list(tests),
+                                                       as_array=as_array) for qc_input, as_array in
+                                             zip(qc_inputs, as_arrays)], return_exceptions=True)
+        for (_, _, future), result in zip(batch.requests, results):
+            if future.cancelled():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+def _execute_batch(platform: PlatformQC, qc_inputs: List[QCInputLike], measurement_name: str, tests: List[str],
+                   as_arrays: List[bool]) -> List[Dict[str, FlagsLike]]:
+    # the flags are converted to lists in the executor, not in the event loop
+    all_flags = QC.execute_batch(platform, qc_inputs, measurement_name, tests, as_array=True)
+    return [flags if as_array else {test: flags_to_list(flag) for test, flag in flags.items()}
+            for flags, as_array in zip(all_flags, as_arrays)]
@@ -0,0 +1,93 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from qclib.PlatformQC import PlatformQC
+from qclib.utils.flags import NO_DATA, FlagsLike, empty_flags, flags_to_list
+from qclib.utils.qc_input import ColumnarQCInput, QCInputLike
+from qclib.utils.qc_input_helpers import as_columnar
+
+
+class QCStream:
+    """
+    Incremental QC of one measurement of one platform.
+
+    Data is appended in chunks, each chunk sorted and later than the previous one, and append returns the flags of the
+    points that are final, oldest first, in the same format as QC.execute (None for the points without a value, or
+    int8 arrays with NO_DATA with as_array).
+    The stream only keeps the historical points the tests need (number_of_historical of qctest_additional_data_size).
+    The flags of the last number_of_future points are only final when the next points arrive, so they are returned by
+    a later append or by flush, at the end of the series. The first points are also held until there are
+    number_of_historical of them, the window tests fall back to shorter windows on shorter series.
+
+    Flags are the same as QC.execute on the whole series.
+    """
+
+    def __init__(self, platform: PlatformQC, measurement_name: str, tests: List[str]):
+        self.platform = platform
+        self.measurement_name = measurement_name
+        self.tests = list(tests)
+        self.number_of_historical, self.number_of_future = platform.additional_data_size(measurement_name, self.tests)
+        # points with a value that have been emitted, at most number_of_historical of them
+        self._history: Optional[ColumnarQCInput] = None
+        # points with a value that have not been emitted yet, at most number_of_future of them after an append, and the
+        # number of rows without a value after each of them. These rows are NO_DATA, only their number is kept.
+        self._pending: Optional[ColumnarQCInput] = None
+        self._pending_gaps = np.zeros(0, dtype=np.int64)
+        self._last_timestamp: Optional[np.datetime64] = None
+
+    @property
+    def number_of_pending(self) -> int:
+        """Number of appended points whose flags have not been returned yet"""
+        return 0 if self._pending is None else len(self._pending) + int(self._pending_gaps.sum())
+
+    def append(self, qc_input: QCInputLike, as_array: bool = False) -> Dict[str, FlagsLike]:
+        qc_input = as_columnar(qc_input)
+        if len(qc_input):
+            assert self._last_timestamp is None or self._last_timestamp <= qc_input.timestamps[0], \
+                f"Appended data has to be later than the data of the stream: {qc_input.timestamps[0]}"
+            self._last_timestamp = qc_input.timestamps[-1]
+        flags = self._process(qc_input, final=False)
+        return flags if as_array else {test: flags_to_list(flag) for test, flag in flags.items()}
+
+    def flush(self, as_array: bool = False) -> Dict[str, FlagsLike]:
+        """Returns the flags of all the pending points, as if the series ends here"""
+        flags = self._process(None, final=True)
+        return flags if as_array else {test: flags_to_list(flag) for test, flag in flags.items()}
+
+    def _process(self, qc_input: Optional[ColumnarQCInput], final: bool) -> Dict[str, np.ndarray]:
+        valid_rows = np.flatnonzero(qc_input.mask) if qc_input is not None else np.zeros(0, dtype=np.int64)
+        size = 0 if qc_input is None else len(qc_input)
+        # rows without a value before the first point with a value of qc_input, and after each of its points
+        leading = int(valid_rows[0]) if len(valid_rows) else size
+        gaps = np.diff(np.append(valid_rows, size)) - 1
+        pending_gaps = self._pending_gaps.copy()
+        if len(pending_gaps):
+            pending_gaps[-1] += leading
+            leading = 0
+        parts = [data for data in [self._pending, None if qc_input is None else qc_input[valid_rows]]
+                 if data is not None]
+        valid = ColumnarQCInput.concatenate(parts) if parts else None
+        point_gaps = np.concatenate([pending_gaps, gaps])
+        number_of_points = len(point_gaps)
+        number_of_final = number_of_points if final else max(number_of_points - self.number_of_future, 0)
+        if not final and self._history is None and number_of_points < self.number_of_historical:
+            number_of_final = 0
+
+        # the leading rows without a value, then each final point followed by the rows without a value after it
+        sizes = 1 + point_gaps[:number_of_final]
+        positions = leading + np.cumsum(sizes) - sizes
+        flags = {test: empty_flags(leading + int(sizes.sum()), NO_DATA) for test in self.tests}
+        if number_of_final > 0:
+            history = self._history if self._history is not None else valid[:0]
+            data = ColumnarQCInput.concatenate([history, valid])
+            valid_flags = self.platform.applyQC(qc_input=data, measurement_name=self.measurement_name,
+                                                tests=self.tests, as_array=True)
+            for test in self.tests:
+                flags[test][positions] = valid_flags[test][len(history):len(history) + number_of_final]
+            emitted = data[:len(history) + number_of_final]
+            self._history = emitted[max(len(emitted) - self.number_of_historical, 0):]
+
+        self._pending = None if valid is None else valid[number_of_final:]
+        self._pending_gaps = point_gaps[number_of_final:]
+        return flags
@@ -5,21 +5,33 @@ Quality Control of Biogeochemical Measurements
 [2] http://www.coriolis.eu.org/content/download/4920/36075/file/Recommendations%20for%20RTQC%20procedures_V1_2.pdf
 """
 import functools
-from typing import List
+from typing import Dict, List, Optional
 
 import numpy as np
 
-from qclib.utils.qc_input import QCInput
-from qclib.utils.qctests_helpers import is_inside_geo_region
+from qclib.utils.flags import FLAG_DTYPE, empty_flags, flags_to_array
+from qclib.utils.qc_input import QCInputLike
+from qclib.utils.months import is_in_months, month_mask
+from qclib.utils.qc_input_helpers import as_columnar
+from qclib.utils.qctests_helpers import points_inside_geo_region
+from qclib.utils.region_index import get_region_index
+from qclib.utils.rolling_window import rolling_count, rolling_variance
+from qclib.utils.segments import is_within_segments
 from qclib.utils.validate_input import validate_data_for_argo_spike_test, initial_flags_for_historical_test
 
 
 def qctest_additional_data_size(number_of_historical=0, number_of_future=0):
-    """Decorator. Adds parameters to the decorated function/method."""
+    """
+    Decorator. Adds parameters to the decorated function/method.
+    The decorated test returns its flags as a list, or as an int8 array when called with as_array=True.
+    """
     def set_parameters(func):
         @functools.wraps(func)
-        def func_wrapper(cls, *args, **opts):
-            return func(cls, *args, **opts)
+        def func_wrapper(cls, *args, as_array: bool = False, **opts):
+            flags = func(cls, *args, **opts)
+            if as_array:
+                return flags_to_array(flags)
+            return flags.tolist() if isinstance(flags, np.ndarray) else flags
 
         func_wrapper.number_of_historical = number_of_historical
         func_wrapper.number_of_future = number_of_future
@@ -37,163 +49,169 @@ class QCTests:
 
     @classmethod
     @qctest_additional_data_size(number_of_historical=1, number_of_future=1)
-    def argo_spike_test(cls, data: QCInput, **opts) -> List[int]:
+    def argo_spike_test(cls, data: QCInputLike, **opts) -> List[int]:
         """
         Spike test according to MyOcean [2] for T and S parameters
         The same test for Oxygen is defined at Bio Argo
         Options:
           threshold: threshold for consecutive double 3-values differences
+          max_gap: optional, points next to a time step larger than max_gap seconds are not tested
         """
-
-        flag = np.zeros(len(data.values), dtype=int)
-        is_valid = np.ones(len(data.values), dtype=bool)
-        is_valid &= validate_data_for_argo_spike_test(data)
+        data = as_columnar(data)
+        flag = np.zeros(len(data), dtype=FLAG_DTYPE)
+        is_valid = np.ones(len(data), dtype=bool)
+        is_valid &= validate_data_for_argo_spike_test(data, opts.get('max_gap'))
 
         # is_valid is an array of booleans describing whether current point has valid historical and future points.
 
-        def k_diff(val, index):
-            if None in val[index - 1:index + 2]:
-                return np.nan
-            else:
-                return abs(val[index] - 0.5 * (val[index + 1] + val[index - 1])) \
-                   - 0.5 * abs(val[index + 1] - val[index - 1])
-
-        values = np.array(data.values)[:, 1]
-        k_diffs = np.zeros(len(data.values))
-        k_diffs[1:-1] = [k_diff(values, i) for i in range(1, len(values) - 1)]
+        # k_diff for all the inner points at once, from the arrays shifted one point back and forth.
+        # Missing values are NaN, so the k_diff of a point next to one is NaN as well.
+        values = data.values
+        previous_values, current_values, next_values = values[:-2], values[1:-1], values[2:]
+        k_diffs = np.zeros(len(data))
+        k_diffs[1:-1] = np.abs(current_values - 0.5 * (next_values + previous_values)) \
+            - 0.5 * np.abs(next_values - previous_values)
 
         flag[is_valid] = -1
         with np.errstate(invalid='ignore'):
             is_valid &= k_diffs < opts['spike_threshold']
         flag[is_valid] = 1
 
-        # noinspection PyTypeChecker
-        return flag.tolist()
+        return flag
 
     @classmethod
     @qctest_additional_data_size()
-    def range_test(cls, data: QCInput, **opts) -> List[int]:
+    def range_test(cls, data: QCInputLike, **opts) -> List[int]:
         """
 
         """
-
+        data = as_columnar(data)
         if 'area' in opts and 'months' in opts:
-            assert len(data.values) == len(data.locations), "Invalid geographical coordinates:" \
-                                                            "Location and values list have different length."
-        flag = np.zeros(len(data.values), dtype=int)
-        is_valid = np.ones(len(data.values), dtype=bool)
-        values = np.array(data.values)
+            assert data.has_locations and len(data) == len(data.longitudes), "Invalid geographical coordinates:" \
+                "Location and values list have different length."
+        flag = np.zeros(len(data), dtype=FLAG_DTYPE)
+        is_valid = np.ones(len(data), dtype=bool)
+        values = data.values
 
         if 'months' in opts:
-            months = set(opts['months'])
-            is_valid &= [value[0].month in months for value in values]
+            is_valid &= is_in_months(data.months, month_mask(opts['months']))
 
         if 'area' in opts:
-            is_valid &= is_inside_geo_region(data.locations, opts['area'])
+            is_valid &= points_inside_geo_region(data.longitudes, data.latitudes, opts['area'])
 
         flag[is_valid] = -1
         if 'min' in opts:
             with np.errstate(invalid='ignore'):
-                is_valid &= values[:, 1].astype(float) >= opts['min']
+                is_valid &= values >= opts['min']
         if 'max' in opts:
             with np.errstate(invalid='ignore'):
-                is_valid &= values[:, 1].astype(float) <= opts['max']
+                is_valid &= values <= opts['max']
 
         flag[is_valid] = 1
 
-        # noinspection PyTypeChecker
-        return flag.tolist()
+        return flag
 
     @classmethod
     @qctest_additional_data_size()
-    def missing_value_test(cls, data: QCInput, **opts) -> List[int]:
+    def local_range_test(cls, data: QCInputLike, thresholds: List[Dict]) -> List[int]:
+        """
+        Range test with thresholds depending on region and month, thresholds is a list of range_test options
+        ({'min', 'max', 'area', 'months'}). The flag is the same as the flags of range_test for each of the thresholds
+        combined with PlatformQC.get_combined_flag, but each region is only looked up once.
+        """
+        return get_region_index(thresholds).flag(as_columnar(data))
+
+    @classmethod
+    @qctest_additional_data_size()
+    def missing_value_test(cls, data: QCInputLike, **opts) -> List[int]:
         """
         Flag values that have the given magic ('nan') value
         """
-        flag = np.full(len(data.values), -1, dtype=np.int)
-        values = np.array(data.values)
+        data = as_columnar(data)
+        flag = np.full(len(data), -1, dtype=FLAG_DTYPE)
 
-        is_valid = values[:, 1].astype(float) != opts['nan']
+        is_valid = data.values != opts['nan']
         flag[is_valid] = 1
 
-        # noinspection PyTypeChecker
-        return flag.tolist()
+        return flag
 
     @classmethod
     @qctest_additional_data_size(number_of_historical=4)
-    def frozen_test(cls, qc_input: QCInput) -> List[int]:
-        """Consecutive data with exactly the same value are flagged as bad"""
+    def frozen_test(cls, qc_input: QCInputLike, max_gap: Optional[float] = None) -> List[int]:
+        """
+        Consecutive data with exactly the same value are flagged as bad. With max_gap, windows spanning a time step
+        larger than max_gap seconds are not tested, as for all the window tests
+        """
         size_historical = QCTests.frozen_test.number_of_historical
+        qc_input = as_columnar(qc_input)
 
-        if len(qc_input.values) < size_historical:
-            return [0 for _ in range(len(qc_input.values))]
-
-        flag_array = initial_flags_for_historical_test(qc_input, size_historical, 2.1)
+        if len(qc_input) < size_historical:
+            return empty_flags(len(qc_input))
 
-        data_diff = np.diff(np.array(qc_input.values)[:, 1].astype(float))
+        flag_array = initial_flags_for_historical_test(qc_input, size_historical, 2.1, max_gap)
 
-        sensor_has_been_frozen = [all(data_diff[-size_historical + i: i] == 0.0)
-                                  for i in range(size_historical, len(qc_input.values))]
-        flag_array[[False] * size_historical + sensor_has_been_frozen] = -1
-        return list(flag_array.tolist())
+        # the window of point i holds the differences between the points i - size_historical, ..., i
+        value_is_unchanged = np.append(np.diff(qc_input.values) == 0.0, False)
+        sensor_has_been_frozen = rolling_count(value_is_unchanged, size_historical) == size_historical
+        flag_array[sensor_has_been_frozen & is_within_segments(qc_input, size_historical, max_gap)] = -1
+        return flag_array
 
     @classmethod
     @qctest_additional_data_size(number_of_historical=4)
-    def flatness_test(cls, data: QCInput, max_variance) -> List[int]:
+    def flatness_test(cls, data: QCInputLike, max_variance, max_gap: Optional[float] = None) -> List[int]:
         """This test flags 'flat' data as bad. If the variance is below max_variance flag = -1"""
-        flag = np.zeros(len(data.values), dtype=int)
-        is_valid = np.ones(len(data.values), dtype=bool)
+        data = as_columnar(data)
+        values = data.values
+        flag = np.ones(len(values), dtype=FLAG_DTYPE)
         size = QCTests.flatness_test.number_of_historical
-        data = np.array(data.values)[:, 1].astype(float)
-        if len(data) < size:
-            size = len(data) - 1
-        is_flat = [False] * size + \
-                  [data[-size + i: i].var() < max_variance for i in range(size, len(data))]
-        flag[is_valid] = 1
-        is_valid &= np.array(is_flat)
-        flag[is_valid] = -1
-        # noinspection PyTypeChecker
-        return flag.tolist()
+        if len(values) < size:
+            size = len(values) - 1
+        if size > 0:
+            with np.errstate(invalid='ignore'):
+                is_flat = rolling_variance(values, size) < max_variance
+            flag[is_flat & is_within_segments(data, size, max_gap)] = -1
+        return flag
 
     @classmethod
     @qctest_additional_data_size(number_of_historical=3)
-    def bounded_variance_test(cls, qc_input: QCInput, max_variance: float) -> List[int]:
+    def bounded_variance_test(cls, qc_input: QCInputLike, max_variance: float,
+                              max_gap: Optional[float] = None) -> List[int]:
         """Consecutive data with variance above max_variance are flagged as bad."""
         size_historical = QCTests.bounded_variance_test.number_of_historical
-        values = np.array(qc_input.values)[:, 1].astype(float)
+        qc_input = as_columnar(qc_input)
+        values = qc_input.values
 
         if len(values) < size_historical:
-            return [0 for _ in range(len(values))]
+            return empty_flags(len(values))
 
-        flag_array = initial_flags_for_historical_test(qc_input, size_historical, 2.1)
+        flag_array = initial_flags_for_historical_test(qc_input, size_historical, 2.1, max_gap)
 
-        variance_array = [values[i - size_historical: i].var() for i in range(size_historical, len(values))]
-        variance_too_large = [False] * size_historical + [var > max_variance for var in variance_array]
-        flag_array[variance_too_large] = -1
-        return list(flag_array.tolist())
+        with np.errstate(invalid='ignore'):
+            variance_too_large = rolling_variance(values, size_historical) > max_variance
+        flag_array[variance_too_large & is_within_segments(qc_input, size_historical, max_gap)] = -1
+        return flag_array
 
     @classmethod
     @qctest_additional_data_size(number_of_historical=9)
-    def pump_history_test(cls, qc_input: QCInput) -> List[int]:
+    def pump_history_test(cls, qc_input: QCInputLike, max_gap: Optional[float] = None) -> List[int]:
         """
         Pump is on for at least 10 minutes, which is equivalent to 10 consecutive points
         with sampling interval 60s
         """
         size_historical = QCTests.pump_history_test.number_of_historical
+        qc_input = as_columnar(qc_input)
 
-        if len(qc_input.values) < size_historical:
-            return [-1 for _ in range(len(qc_input.values))]
+        if len(qc_input) < size_historical:
+            return empty_flags(len(qc_input), -1)
 
-        flag_array = initial_flags_for_historical_test(qc_input, size_historical, 2.1)
+        flag_array = initial_flags_for_historical_test(qc_input, size_historical, 2.1, max_gap)
         # For the pump history test, if we can't run the test the data counts as invalid.
         flag_array[flag_array==0] = -1
 
-        pump_values = np.array(qc_input.values)[:, 1]
-        pump_values[pump_values==None] = 0
-        pump_values = pump_values.astype(int)
+        # missing pump values (None/NaN) count as pump turned off
+        pump_values = np.nan_to_num(qc_input.values, nan=0).astype(int)
 
-        pump_has_been_turned_off = [any(pump_values[-size_historical + i: i+1] == 0)
-                                    for i in range(size_historical, len(qc_input.values))]
-        flag_array[[False] * size_historical + pump_has_been_turned_off] = -1
+        pump_has_been_turned_off = rolling_count(pump_values == 0, size_historical, include_current=True) > 0
+        flag_array[pump_has_been_turned_off] = -1
 
-        return list(flag_array.tolist())
+        return flag_array
@@ -47,8 +47,8 @@ S_BalticProper = {'lat': (54.52, 54.52, 56.20, 56.20),
 N_BalticProper = {'lat': (58.36, 58.36, 59.62, 59.62),
                   'lon': (19.88, 23.21, 23.21, 19.88)}
 
-# FIXME: Currently local_* thresholds is a list[Dict] while global_* and spike_*
-#   is a Dict. This has consequences for as to how the flag is calculated in applyQC
+# local_* thresholds are a list[Dict], one per region and months, while global_* and spike_* are a Dict.
+#   The local ones are compiled into a month x region table by qclib.utils.region_index (see QCTests.local_range_test)
 # Global_Threshold_Ranges:
 ''' from Source 1 '''
 global_range_temperature = {'min': -2.5, 'max': 40.0}
@@ -0,0 +1,30 @@
+from typing import List, Optional, Sequence, Union
+
+import numpy as np
+
+# Flags as arrays are int8, -1 bad, 0 not tested and 1 good, and NO_DATA where the flags as lists hold None
+FLAG_DTYPE = np.int8
+NO_DATA = -128
+
+FlagsLike = Union[Sequence[Optional[int]], np.ndarray]
+
+
+def empty_flags(size: int, fill_value: int = 0) -> np.ndarray:
+    return np.full(size, fill_value, dtype=FLAG_DTYPE)
+
+
+def flags_to_array(flags: FlagsLike) -> np.ndarray:
+    """int8 array of flags given as a list, None becomes NO_DATA"""
+    if isinstance(flags, np.ndarray) and flags.dtype != object:
+        return flags.astype(FLAG_DTYPE, copy=False)
+    return np.array([NO_DATA if flag is None else flag for flag in flags], dtype=FLAG_DTYPE)
+
+
+def flags_to_list(flags: np.ndarray) -> List[Optional[int]]:
+    """List of the flags of an int8 array, NO_DATA becomes None"""
+    no_data = flags == NO_DATA
+    if not no_data.any():
+        return flags.tolist()
+    flag_list = flags.astype(object)
+    flag_list[no_data] = None
+    return flag_list.tolist()
@@ -0,0 +1,29 @@
+import functools
+from typing import Iterable
+
+import numpy as np
+
+ALL_MONTHS = 0xFFF
+
+
+def month_mask(months: Iterable[int]) -> int:
+    """12-bit mask of a set of months 1..12, bit month - 1 is set for each month"""
+    mask = 0
+    for month in months:
+        if not 1 <= month <= 12:
+            raise ValueError(f"Invalid month: {month}")
+        mask |= 1 << (month - 1)
+    return mask
+
+
+@functools.lru_cache(maxsize=None)
+def month_table(mask: int) -> np.ndarray:
+    """Lookup table indexed by month, True for the months of mask. Index 0 is unused and False"""
+    table = ((mask << 1) >> np.arange(13) & 1).astype(bool)
+    table.setflags(write=False)
+    return table
+
+
+def is_in_months(months: np.ndarray, mask: int) -> np.ndarray:
+    """True for the months (uint8 array of 1..12, see ColumnarQCInput.months) that are in mask"""
+    return month_table(mask)[months]
@@ -2,10 +2,13 @@
 Reference: MATLAB script based on American Practical Navigator, Vol II, 1975 Edition, p 5
 Modification of python script from Anna Birgitta Ledang
 """
+from datetime import datetime
+from typing import List, Optional, Sequence, Union
+
 import numpy as np
-from typing import Union, List
 
 from qclib.utils.measurement import Location
+from qclib.utils.qc_input import ColumnarQCInput, to_datetime64
 
 KNOT2MPS = 1852.0 / 3600.0
 
@@ -14,9 +17,7 @@ def latitude2meters(delta_latitude=None, average_latitude=None, latitude=None):
     if delta_latitude is None:
         delta_latitude = np.diff(latitude)
     if average_latitude is None:
-        i1 = np.arange(1, len(latitude))
-        i0 = i1 - 1
-        average_latitude = 0.5 * (latitude[i0] + latitude[i1])
+        average_latitude = 0.5 * (latitude[:-1] + latitude[1:])
     average_latitude_radians = np.deg2rad(average_latitude)
     # length_of_degree at in meters, of a degree of the meridian
     length_of_degree = \
@@ -29,9 +30,7 @@ def longitude2meters(delta_longitude=None, average_latitude=None, longitude=None
     if delta_longitude is None:
         delta_longitude = np.diff(longitude)
     if average_latitude is None:
-        i1 = np.arange(1, len(latitude))
-        i0 = i1 - 1
-        average_latitude = 0.5 * (latitude[i0] + latitude[i1])
+        average_latitude = 0.5 * (latitude[:-1] + latitude[1:])
     average_latitude_radians = np.deg2rad(average_latitude)
     # length of degree depends on latitude
     length_of_degree = 111415.13 * np.cos(average_latitude_radians) - 94.55 * np.cos(3 * average_latitude_radians)
@@ -46,25 +45,42 @@ def lonlat2meters(longitude, latitude):
     return distance
 
 
-def dt2seconds(time):
-    delta_time = np.diff(time)
-    seconds = [x.total_seconds() for x in delta_time]
-    return seconds
+def dt2seconds(time: Union[Sequence[datetime], np.ndarray]) -> np.ndarray:
+    """Seconds between consecutive times, datetimes or datetime64"""
+    return np.diff(to_datetime64(time)).astype(np.int64) / 1e9
 
 
-def velocity(time: Union[List, np.array], longitude: Union[List, np.array], latitude: Union[List, np.array]):
-    """Finite difference , forward scheme"""
-    longitude = longitude if type(longitude) == np.array else np.array(longitude)
-    latitude = latitude if type(latitude) == np.array else np.array(latitude)
+def velocity(time: Union[Sequence[datetime], np.ndarray], longitude: Union[List, np.ndarray],
+             latitude: Union[List, np.ndarray]) -> np.ndarray:
+    """
+    Finite difference , forward scheme
+    Float64 arrays are used as they are, lists are converted with None as NaN. The velocity is NaN where a location
+    is missing.
+    """
+    longitude = np.asarray(longitude, dtype=np.float64)
+    latitude = np.asarray(latitude, dtype=np.float64)
 
     delta_time = dt2seconds(time)
     delta_distance = lonlat2meters(longitude, latitude)
-    return delta_distance / delta_time
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return delta_distance / delta_time
 
 
-def velocity_from_location_list(locations: List[Location]):
-    time = np.array([el[0] for el in locations])
-    lon = np.array([el[1] for el in locations]).astype(float)
-    lat = np.array([el[2] for el in locations]).astype(float)
-    velocities = velocity(time, lon, lat)
+def velocity_from_location_list(locations: List[Location]) -> List[Optional[float]]:
+    velocities = velocity([location[0] for location in locations],
+                          [location[1] for location in locations],
+                          [location[2] for location in locations])
     return np.where(np.isnan(velocities), None, velocities).tolist()
+
+
+def velocity_qc_input(data: ColumnarQCInput) -> ColumnarQCInput:
+    """
+    Velocities between the consecutive locations of data, each at the time and location of the later point, as input
+    of the tests of the 'velocity' measurement. Velocities with a missing location have no value.
+    """
+    assert data.has_locations and len(data.longitudes) == len(data), "velocity needs a location for every point"
+    return ColumnarQCInput.from_arrays(timestamps=data.timestamps[1:],
+                                       values=velocity(data.timestamps, data.longitudes, data.latitudes),
+                                       longitudes=data.longitudes[1:],
+                                       latitudes=data.latitudes[1:],
+                                       utc_offsets=None if data.utc_offsets is None else data.utc_offsets[1:])
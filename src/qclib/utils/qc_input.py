@@ -1,5 +1,7 @@
-from typing import List, Optional
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Hashable, List, Optional, Sequence, Tuple, Union
 
+import numpy as np
 from pydantic import BaseModel
 
 from qclib.utils.measurement import Measurement, Location
@@ -8,3 +10,212 @@ from qclib.utils.measurement import Measurement, Location
 class QCInput(BaseModel):
     values: List[Measurement]
     locations: Optional[List[Location]]
+
+
+_EPOCH = datetime(1970, 1, 1)
+_UTC_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def to_datetime64(timestamps: Union[Sequence[datetime], np.ndarray]) -> np.ndarray:
+    """
+    Converts timestamps to a datetime64[ns] array. Timezone aware datetimes are converted to naive UTC, naive and aware
+    datetimes can not be mixed.
+    """
+    if isinstance(timestamps, np.ndarray) and np.issubdtype(timestamps.dtype, np.datetime64):
+        return timestamps.astype('datetime64[ns]', copy=False)
+    if len(timestamps) == 0 or not isinstance(timestamps[0], datetime):
+        return np.array(timestamps, dtype='datetime64[ns]')
+    # microseconds since the epoch as integers, this is several times faster than numpy's conversion of datetimes
+    is_aware = timestamps[0].tzinfo is not None
+    if any((timestamp.tzinfo is not None) is not is_aware for timestamp in timestamps):
+        raise ValueError("timestamps have to be all timezone naive or all timezone aware")
+    epoch = _UTC_EPOCH if is_aware else _EPOCH
+    microseconds = np.fromiter(((timestamp - epoch) // _MICROSECOND for timestamp in timestamps), dtype=np.int64,
+                               count=len(timestamps))
+    return microseconds.astype('datetime64[us]').astype('datetime64[ns]')
+
+
+def to_utc_offsets(timestamps: Union[Sequence[datetime], np.ndarray]) -> Optional[np.ndarray]:
+    """UTC offsets of timezone aware datetimes as a timedelta64[ns] array, None for naive timestamps"""
+    if len(timestamps) == 0 or not isinstance(timestamps[0], datetime) or timestamps[0].tzinfo is None:
+        return None
+    microseconds = np.fromiter((timestamp.utcoffset() // _MICROSECOND for timestamp in timestamps), dtype=np.int64,
+                               count=len(timestamps))
+    return microseconds.astype('timedelta64[us]').astype('timedelta64[ns]')
+
+
+class ColumnarQCInput:
+    """
+    Column oriented version of QCInput, one NumPy array per field:
+      timestamps: datetime64[ns]
+      values: float64, missing values (None) are stored as NaN
+      longitudes, latitudes: float64, optional
+      mask: True where the row holds a value, this is what remove_nans filters on
+      utc_offsets: timedelta64[ns], optional, the UTC offsets of timezone aware timestamps, which are stored in UTC.
+        The months are taken from the local time
+    Quantities derived from the timestamps or locations (time steps, initial flags of the historical tests, ...) are
+    cached on the instance, so that all the tests run on the same input compute them once. The arrays should therefore
+    not be modified in place. Quantities with one element per row (months, region membership) are computed once for an
+    input and the inputs selected from it, with the same timestamps or with other values (with_values).
+    """
+
+    def __init__(self, timestamps, values, longitudes=None, latitudes=None, mask=None):
+        """Converts the columns to arrays of the expected types and validates their shapes"""
+        timestamps = to_datetime64(timestamps)
+        values = np.asarray(values, dtype=np.float64)
+        longitudes = None if longitudes is None else np.asarray(longitudes, dtype=np.float64)
+        latitudes = None if latitudes is None else np.asarray(latitudes, dtype=np.float64)
+        mask = None if mask is None else np.asarray(mask, dtype=bool)
+        if values.ndim != 1 or timestamps.shape != values.shape:
+            raise ValueError("timestamps and values must be one dimensional and have the same length")
+        if (longitudes is None) != (latitudes is None) or \
+                (longitudes is not None and (longitudes.ndim != 1 or longitudes.shape != latitudes.shape)):
+            raise ValueError("longitudes and latitudes must be given together, one dimensional and of the same length")
+        if mask is not None and mask.shape != values.shape:
+            raise ValueError("mask and values must have the same length")
+        self._set_columns(timestamps, values, longitudes, latitudes, mask, to_utc_offsets(timestamps))
+
+    @classmethod
+    def from_arrays(cls, timestamps: np.ndarray, values: np.ndarray, longitudes: Optional[np.ndarray] = None,
+                    latitudes: Optional[np.ndarray] = None, mask: Optional[np.ndarray] = None,
+                    utc_offsets: Optional[np.ndarray] = None) -> 'ColumnarQCInput':
+        """
+        Trusted construction from arrays that already have the expected types and shapes, they are used as they are
+        without conversion nor validation. This is the path used within qclib, external data should go through the
+        constructor.
+        """
+        data = cls.__new__(cls)
+        data._set_columns(timestamps, values, longitudes, latitudes, mask, utc_offsets)
+        return data
+
+    def _set_columns(self, timestamps, values, longitudes, latitudes, mask, utc_offsets):
+        self.timestamps = timestamps
+        self.values = values
+        self.longitudes = longitudes
+        self.latitudes = latitudes
+        self.mask = ~np.isnan(values) if mask is None else mask
+        self.utc_offsets = utc_offsets
+        self._cache = {}
+        # (input, index) this input was selected from, see cached_rows
+        self._parent: Optional[Tuple['ColumnarQCInput', Any]] = None
+
+    @classmethod
+    def from_qc_input(cls, data: QCInput) -> 'ColumnarQCInput':
+        # the tuples have been validated by QCInput, the columns are built from plain lists which is much faster than
+        # going through object arrays
+        values = [value[1] for value in data.values]
+        longitudes = latitudes = None
+        if data.locations is not None:
+            longitudes = np.array([location[1] for location in data.locations], dtype=np.float64)
+            latitudes = np.array([location[2] for location in data.locations], dtype=np.float64)
+        timestamps = [value[0] for value in data.values]
+        return cls.from_arrays(timestamps=to_datetime64(timestamps),
+                               values=np.array(values, dtype=np.float64),
+                               longitudes=longitudes,
+                               latitudes=latitudes,
+                               mask=np.array([value is not None for value in values], dtype=bool),
+                               utc_offsets=to_utc_offsets(timestamps))
+
+    @property
+    def has_locations(self) -> bool:
+        return self.longitudes is not None and self.latitudes is not None
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getstate__(self):
+        # the cached quantities and the input it was selected from are not sent to other processes
+        state = self.__dict__.copy()
+        state['_cache'] = {}
+        state['_parent'] = None
+        return state
+
+    def cached(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Returns compute(), which is only called the first time key is requested. compute must not depend on values"""
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    def cached_rows(self, key: Hashable, compute: Callable[['ColumnarQCInput'], np.ndarray]) -> np.ndarray:
+        """Like cached, for quantities with one element per row computed by compute(data). For an input selected from
+        another input the rows are taken from the quantity of that input, so it is computed once for both"""
+        if key not in self._cache:
+            if self._parent is not None:
+                parent, index = self._parent
+                self._cache[key] = parent.cached_rows(key, compute)[index]
+            else:
+                self._cache[key] = compute(self)
+        return self._cache[key]
+
+    @property
+    def time_diffs(self) -> np.ndarray:
+        """Time steps between consecutive timestamps in nanoseconds (int64)"""
+        return self.cached('time_diffs', lambda: np.diff(self.timestamps.astype(np.int64)))
+
+    @property
+    def local_timestamps(self) -> np.ndarray:
+        """Timestamps in the timezone of the input, the same as timestamps for timezone naive input"""
+        return self.timestamps if self.utc_offsets is None else self.timestamps + self.utc_offsets
+
+    @property
+    def months(self) -> np.ndarray:
+        """Month of each timestamp in local time, 1 to 12 (uint8)"""
+        return self.cached_rows('months', lambda data: (data.local_timestamps.astype('datetime64[M]').astype(np.int64)
+                                                        % 12 + 1).astype(np.uint8))
+
+    def with_values(self, values, mask=None) -> 'ColumnarQCInput':
+        """Input with the same timestamps and locations and other values, sharing the cached quantities"""
+        values = np.asarray(values, dtype=np.float64)
+        mask = None if mask is None else np.asarray(mask, dtype=bool)
+        if values.shape != self.values.shape or (mask is not None and mask.shape != values.shape):
+            raise ValueError("values and mask must have one element per timestamp")
+        data = ColumnarQCInput.from_arrays(self.timestamps, values, self.longitudes, self.latitudes, mask,
+                                           self.utc_offsets)
+        data._cache = self._cache
+        data._parent = self._parent
+        return data
+
+    def __getitem__(self, index: Union[slice, np.ndarray]) -> 'ColumnarQCInput':
+        """Selects rows by slice, index array or boolean mask. Locations are only selected when they are aligned with
+        the values"""
+        longitudes, latitudes = self.longitudes, self.latitudes
+        if self.has_locations and len(longitudes) == len(self):
+            longitudes, latitudes = longitudes[index], latitudes[index]
+        utc_offsets = None if self.utc_offsets is None else self.utc_offsets[index]
+        selected = ColumnarQCInput.from_arrays(timestamps=self.timestamps[index],
+                                               values=self.values[index],
+                                               longitudes=longitudes,
+                                               latitudes=latitudes,
+                                               mask=self.mask[index],
+                                               utc_offsets=utc_offsets)
+        selected._parent = (self, index)
+        return selected
+
+    def compress(self, keep: np.ndarray) -> 'ColumnarQCInput':
+        """Returns the rows where keep is True"""
+        return self[np.asarray(keep, dtype=bool)]
+
+    @classmethod
+    def concatenate(cls, inputs: Sequence['ColumnarQCInput']) -> 'ColumnarQCInput':
+        """Rows of all the inputs, locations are kept when all the inputs have locations aligned with the values.
+        Timezone naive and aware inputs can not be mixed"""
+        longitudes = latitudes = None
+        if all(data.has_locations and len(data.longitudes) == len(data) for data in inputs):
+            longitudes = np.concatenate([data.longitudes for data in inputs])
+            latitudes = np.concatenate([data.latitudes for data in inputs])
+        utc_offsets = None
+        if any(data.utc_offsets is not None for data in inputs):
+            if any(data.utc_offsets is None and len(data) for data in inputs):
+                raise ValueError("timestamps have to be all timezone naive or all timezone aware")
+            utc_offsets = np.concatenate([np.zeros(0, dtype='timedelta64[ns]') if data.utc_offsets is None
+                                          else data.utc_offsets for data in inputs])
+        return cls.from_arrays(timestamps=np.concatenate([data.timestamps for data in inputs]),
+                               values=np.concatenate([data.values for data in inputs]),
+                               longitudes=longitudes,
+                               latitudes=latitudes,
+                               mask=np.concatenate([data.mask for data in inputs]),
+                               utc_offsets=utc_offsets)
+
+
+QCInputLike = Union[QCInput, ColumnarQCInput]
@@ -1,30 +1,73 @@
+from datetime import timezone
 from typing import Dict, List
-from qclib.utils.qc_input import QCInput
 
+import numpy as np
 
-def remove_nans(data: QCInput) -> QCInput:
-    new_values = []
-    new_locations = []
-    if data.locations is None:
-        new_locations = None
+from qclib.utils.flags import NO_DATA, empty_flags
+from qclib.utils.qc_input import QCInput, ColumnarQCInput, QCInputLike
 
-    for i, val in enumerate(data.values):
-        if None not in val:
-            new_values.append(val)
-            if data.locations is not None and len(data.locations) > 0:
-                new_locations.append(data.locations[i])
-    return QCInput(values=new_values, locations=new_locations)
 
+def as_columnar(data: QCInputLike) -> ColumnarQCInput:
+    if isinstance(data, ColumnarQCInput):
+        return data
+    return ColumnarQCInput.from_qc_input(data)
 
-def flags_resized_to_include_values_for_nan(flags: Dict[str, List[int]], data: QCInput) ->Dict[str, List[int]]:
 
-    size = len(data.values)
-    new_flags = {key: [None]*size for key in flags.keys()}
-    for key, values in new_flags.items():
-        old_flag_index = 0
-        for index, new_flag in enumerate(values):
-            if None not in data.values[index]:
-                new_flags[key][index] = flags[key][old_flag_index]
-                old_flag_index = old_flag_index + 1
+def as_qc_input(data: QCInputLike) -> QCInput:
+    """QCInput of the rows of data, timezone aware timestamps are given back in their timezone"""
+    if isinstance(data, QCInput):
+        return data
+    timestamps = data.timestamps.astype('datetime64[us]').tolist()
+    if data.utc_offsets is not None:
+        timestamps = [(timestamp + offset).replace(tzinfo=timezone(offset))
+                      for timestamp, offset in zip(timestamps, data.utc_offsets.astype('timedelta64[us]').tolist())]
+    values = [value if is_valid else None for value, is_valid in zip(data.values.tolist(), data.mask.tolist())]
+    locations = None
+    if data.has_locations and len(data.longitudes) == len(data):
+        locations = list(zip(timestamps, data.longitudes.tolist(), data.latitudes.tolist()))
+    # the columns have already been validated, the model is constructed without validating them again
+    return QCInput.construct(values=list(zip(timestamps, values)), locations=locations)
+
+
+def has_value(data: QCInputLike) -> np.ndarray:
+    """Boolean array, True for the rows that are not None"""
+    if isinstance(data, ColumnarQCInput):
+        return data.mask
+    return np.not_equal(np.array([value[1] for value in data.values], dtype=object), None)
+
+
+def remove_nans(data: QCInputLike) -> QCInputLike:
+    keep = has_value(data)
+    if isinstance(data, ColumnarQCInput):
+        return data if keep.all() else data[keep]
+
+    # the tuples have already been validated, the model is constructed without validating them again
+    index = np.flatnonzero(keep)
+    new_locations = None
+    if data.locations is not None:
+        new_locations = [data.locations[i] for i in index] if len(data.locations) > 0 else []
+    return QCInput.construct(values=[data.values[i] for i in index], locations=new_locations)
+
+
+def flags_resized_to_include_values_for_nan(flags: Dict[str, List[int]], data: QCInputLike) ->Dict[str, List[int]]:
+    """Flags of the rows with a value scattered back to all the rows of data, None for the others"""
+    keep = has_value(data)
+    new_flags = {}
+    for key, flag in flags.items():
+        new_flag = np.full(len(keep), None, dtype=object)
+        new_flag[keep] = flag
+        new_flags[key] = new_flag.tolist()
+
+    return new_flags
+
+
+def flag_arrays_resized_to_include_no_data(flags: Dict[str, np.ndarray], data: QCInputLike) -> Dict[str, np.ndarray]:
+    """Flags of the rows with a value scattered back to all the rows of data, NO_DATA for the others"""
+    keep = has_value(data)
+    new_flags = {}
+    for key, flag in flags.items():
+        new_flag = empty_flags(len(keep), NO_DATA)
+        new_flag[keep] = flag
+        new_flags[key] = new_flag
 
     return new_flags
@@ -1,13 +1,22 @@
 from datetime import datetime
 from typing import List, Dict, Tuple
 
-import matplotlib as mpl
 import numpy as np
-from matplotlib import path
 
 
 def is_inside_geo_region(locations: List[Tuple[datetime, float, float]],
                          area: Dict[str, Tuple[float, float, float, float]]) -> np.ndarray:
+    locations = np.array(locations, dtype=object).reshape(len(locations), 3)
+    return points_inside_geo_region(locations[:, 1].astype(float), locations[:, 2].astype(float), area)
+
+
+def points_inside_geo_region(longitudes: np.ndarray, latitudes: np.ndarray,
+                             area: Dict[str, Tuple[float, float, float, float]]) -> np.ndarray:
+    return points_inside_polygon(longitudes, latitudes, geo_region_polygon(area))
+
+
+def geo_region_polygon(area: Dict[str, Tuple[float, float, float, float]]) -> np.ndarray:
+    """Vertices of the area as an array of (lon, lat), closed by repeating the first vertex"""
     lon = area['lon']
     lat = area['lat']
     number_of_points = len(lon)
@@ -15,9 +24,24 @@ def is_inside_geo_region(locations: List[Tuple[datetime, float, float]],
     points_of_geo_region[0:number_of_points, 0] = lon
     points_of_geo_region[0:number_of_points, 1] = lat
     points_of_geo_region[number_of_points, 0:2] = [lon[0], lat[0]]
-    geo_region = mpl.path.Path(points_of_geo_region)
-    pts = np.ones([len(locations), 2])
-    pts[:, 0] = np.array(locations)[:, 1]
-    pts[:, 1] = np.array(locations)[:, 2]
-    inside = geo_region.contains_points(pts)
-    return inside.astype(bool)
+    return points_of_geo_region
+
+
+def points_inside_polygon(longitudes: np.ndarray, latitudes: np.ndarray, geo_region: np.ndarray) -> np.ndarray:
+    """
+    Crossing number test, vectorized over the points: a point is inside when a ray from it crosses the edges of the
+    polygon an odd number of times. The crossing rule is the one of matplotlib's Path.contains_points, points with NaN
+    coordinates are outside.
+    """
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    inside = np.zeros(len(longitudes), dtype=bool)
+    vertices = geo_region.tolist()
+    with np.errstate(invalid='ignore'):
+        for (lon0, lat0), (lon1, lat1) in zip(vertices[:-1], vertices[1:]):
+            lat_flag0 = lat0 >= latitudes
+            lat_flag1 = lat1 >= latitudes
+            crosses = (lat_flag0 != lat_flag1) & \
+                (((lat1 - latitudes) * (lon0 - lon1) >= (lon1 - longitudes) * (lat0 - lat1)) == lat_flag1)
+            inside ^= crosses
+    return inside & ~np.isnan(longitudes) & ~np.isnan(latitudes)
@@ -0,0 +1,112 @@
+import functools
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from qclib.utils.flags import empty_flags
+from qclib.utils.months import ALL_MONTHS, month_mask, month_table
+from qclib.utils.qc_input import ColumnarQCInput
+from qclib.utils.qctests_helpers import geo_region_polygon, points_inside_polygon
+
+Area = Dict[str, Tuple[float, ...]]
+
+
+class RegionIndex:
+    """
+    Local range thresholds, a list of {'min', 'max', 'area', 'months'} rows, compiled into a month x region table.
+    Every distinct area is one region, with its polygon and bounding box. For each region and month the table holds the
+    tightest bounds of the rows that apply, so that one pass over the data gives the same flag as running range_test
+    once per row and combining the flags with PlatformQC.get_combined_flag:
+       0 no row applies, -1 the value is out of the bounds of a row that applies, 1 otherwise
+    Rows without an area apply everywhere, rows without months apply to all months.
+    """
+
+    def __init__(self, thresholds: List[Dict]):
+        self.areas: List[Optional[Area]] = []
+        region_keys = []
+        for row in thresholds:
+            key = _area_key(row.get('area'))
+            if key not in region_keys:
+                region_keys.append(key)
+                self.areas.append(row.get('area'))
+
+        # column 0 is unused, months are 1..12
+        self.applies = np.zeros((len(self.areas), 13), dtype=bool)
+        self.minimum = np.full((len(self.areas), 13), -np.inf)
+        self.maximum = np.full((len(self.areas), 13), np.inf)
+        for row in thresholds:
+            region = region_keys.index(_area_key(row.get('area')))
+            months = month_table(month_mask(row['months']) if 'months' in row else ALL_MONTHS)
+            self.applies[region, months] = True
+            self.minimum[region, months] = np.maximum(self.minimum[region, months], row.get('min', -np.inf))
+            self.maximum[region, months] = np.minimum(self.maximum[region, months], row.get('max', np.inf))
+
+        self.polygons = [None if area is None else geo_region_polygon(area) for area in self.areas]
+        self.bounding_boxes = [None if area is None else (min(area['lon']), max(area['lon']),
+                                                          min(area['lat']), max(area['lat']))
+                               for area in self.areas]
+
+    def is_inside(self, data: ColumnarQCInput, region: int) -> np.ndarray:
+        """Points of data inside the region. Only points inside the bounding box are tested against the polygon"""
+        area = self.areas[region]
+        if area is None:
+            return np.ones(len(data), dtype=bool)
+
+        def compute(data: ColumnarQCInput) -> np.ndarray:
+            lon_min, lon_max, lat_min, lat_max = self.bounding_boxes[region]
+            with np.errstate(invalid='ignore'):
+                candidates = np.flatnonzero((data.longitudes >= lon_min) & (data.longitudes <= lon_max) &
+                                            (data.latitudes >= lat_min) & (data.latitudes <= lat_max))
+            inside = np.zeros(len(data), dtype=bool)
+            inside[candidates] = points_inside_polygon(data.longitudes[candidates], data.latitudes[candidates],
+                                                       self.polygons[region])
+            return inside
+
+        return data.cached_rows(('is_inside_geo_region', _area_key(area)), compute)
+
+    def flag(self, data: ColumnarQCInput) -> np.ndarray:
+        if any(area is not None for area in self.areas):
+            assert data.has_locations and len(data) == len(data.longitudes), "Invalid geographical coordinates:" \
+                "Location and values list have different length."
+        months = data.months
+        values = data.values
+
+        row_applies = np.zeros(len(data), dtype=bool)
+        out_of_range = np.zeros(len(data), dtype=bool)
+        for region in range(len(self.areas)):
+            applies = self.is_inside(data, region) & self.applies[region, months]
+            minimum = self.minimum[region, months]
+            maximum = self.maximum[region, months]
+            with np.errstate(invalid='ignore'):
+                in_range = ((values >= minimum) | np.isneginf(minimum)) & ((values <= maximum) | np.isposinf(maximum))
+            row_applies |= applies
+            out_of_range |= applies & ~in_range
+
+        flag = empty_flags(len(data))
+        flag[row_applies] = 1
+        flag[out_of_range] = -1
+        return flag
+
+
+def _area_key(area: Optional[Area]):
+    return None if area is None else (tuple(area['lon']), tuple(area['lat']))
+
+
+def _thresholds_key(thresholds: List[Dict]):
+    return tuple((row.get('min'), row.get('max'), _area_key(row.get('area')),
+                  None if 'months' not in row else tuple(row['months'])) for row in thresholds)
+
+
+@functools.lru_cache(maxsize=32)
+def _cached_region_index(thresholds_key) -> RegionIndex:
+    thresholds = []
+    for minimum, maximum, area, months in thresholds_key:
+        row = {'min': minimum, 'max': maximum, 'area': None if area is None else {'lon': area[0], 'lat': area[1]},
+               'months': months}
+        thresholds.append({key: value for key, value in row.items() if value is not None})
+    return RegionIndex(thresholds)
+
+
+def get_region_index(thresholds: List[Dict]) -> RegionIndex:
+    """RegionIndex of the thresholds, built once for every distinct list of thresholds"""
+    return _cached_region_index(_thresholds_key(thresholds))
@@ -0,0 +1,37 @@
+"""
+Rolling statistics over the historical points of every point in a series, computed in one vectorized pass.
+The result at index i describes the window values[i - size: i], or values[i - size: i + 1] when the current point is
+included. Points with less than size historical points do not have a window.
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def historical_windows(values: np.ndarray, size: int, include_current: bool = False) -> np.ndarray:
+    """
+    Read only view of shape (len(values) - size, window length), row j is the window of the point at index j + size
+    """
+    window_length = size + 1 if include_current else size
+    if len(values) <= size:
+        return np.empty((0, window_length), dtype=values.dtype)
+    windows = sliding_window_view(values, window_length)
+    return windows if include_current else windows[:-1]
+
+
+def rolling_variance(values: np.ndarray, size: int, include_current: bool = False) -> np.ndarray:
+    """Variance of the window of each point, NaN for the points without a window"""
+    variance = np.full(len(values), np.nan)
+    variance[size:] = historical_windows(values, size, include_current).var(axis=-1)
+    return variance
+
+
+def rolling_count(condition: np.ndarray, size: int, include_current: bool = False) -> np.ndarray:
+    """Number of points in the window of each point where condition is True, 0 for the points without a window"""
+    window_length = size + 1 if include_current else size
+    counts = np.zeros(len(condition), dtype=int)
+    if len(condition) <= size:
+        return counts
+    cumulative = np.concatenate(([0], np.cumsum(condition, dtype=int)))
+    window_end = np.arange(size, len(condition)) + (window_length - size)
+    counts[size:] = cumulative[window_end] - cumulative[window_end - window_length]
+    return counts
@@ -0,0 +1,62 @@
+"""
+Segments of a series: runs of consecutive points whose time steps are not larger than a maximum gap, e.g. the dives
+of a glider. Computed once per input and maximum gap, so that the tests only check where their windows would span a
+gap instead of looking at the timestamps again.
+"""
+from typing import List, Optional
+
+import numpy as np
+
+from qclib.utils.qc_input import ColumnarQCInput
+
+
+class SegmentIndex:
+    """
+    starts: index of the first point of each segment
+    positions: index of each point within its segment, the number of points before it in the same segment
+    """
+    __slots__ = ('size', 'starts', 'positions')
+
+    def __init__(self, time_diffs: np.ndarray, size: int, max_gap: float):
+        """
+        time_diffs are the size - 1 time steps of a series in nanoseconds, a step larger than max_gap seconds starts a
+        new segment
+        """
+        is_gap = time_diffs > max_gap * 1e9
+        self.size = size
+        self.starts = np.concatenate(([0], np.flatnonzero(is_gap) + 1)) if size else np.zeros(0, dtype=np.int64)
+        segment = np.concatenate(([0], np.cumsum(is_gap)))[:size]
+        self.positions = np.arange(size) - self.starts[segment]
+
+    @property
+    def number_of_segments(self) -> int:
+        return len(self.starts)
+
+    @property
+    def stops(self) -> np.ndarray:
+        return np.append(self.starts[1:], self.size)
+
+    def slices(self) -> List[slice]:
+        return [slice(start, stop) for start, stop in zip(self.starts.tolist(), self.stops.tolist())]
+
+    def has_history(self, number_of_historical: int) -> np.ndarray:
+        """True for the points preceded by number_of_historical points of the same segment"""
+        return self.positions >= number_of_historical
+
+    def has_neighbours(self) -> np.ndarray:
+        """True for the points with a previous and a next point in the same segment"""
+        is_last = np.zeros(self.size, dtype=bool)
+        is_last[self.stops - 1] = True
+        return (self.positions >= 1) & ~is_last
+
+
+def segment_index(data: ColumnarQCInput, max_gap: float) -> SegmentIndex:
+    """Segments of data split at the time steps larger than max_gap seconds, computed once per input and max_gap"""
+    return data.cached(('segment_index', max_gap), lambda: SegmentIndex(data.time_diffs, len(data), max_gap))
+
+
+def is_within_segments(data: ColumnarQCInput, number_of_historical: int, max_gap: Optional[float]) -> np.ndarray:
+    """True for the points whose number_of_historical previous points do not span a gap, all of them without max_gap"""
+    if max_gap is None:
+        return np.ones(len(data), dtype=bool)
+    return segment_index(data, max_gap).has_history(number_of_historical)
@@ -1,40 +1,63 @@
-from typing import List
-from .qc_input import QCInput
+from .qc_input import QCInputLike, ColumnarQCInput
+from .qc_input_helpers import as_columnar
+from .flags import empty_flags
+from .segments import is_within_segments, segment_index
+from typing import Optional
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 
 
-def validate_data_for_argo_spike_test(data: QCInput) -> List[bool]:
+def validate_data_for_argo_spike_test(data: QCInputLike, max_gap: Optional[float] = None) -> np.ndarray:
+    """A point can be tested when it has a historical and a future point, and the time step to one of them is less
+    than twice the time step to the other. With max_gap, both points have to be in its segment (utils.segments)"""
+    data = as_columnar(data)
+    is_valid = np.zeros(len(data), dtype=bool)
+    time_diffs = data.time_diffs
+    before, after = time_diffs[:-1], time_diffs[1:]
+    is_valid[1:-1] = np.maximum(before, after) < 2 * np.minimum(before, after)
+    if max_gap is not None:
+        is_valid &= segment_index(data, max_gap).has_neighbours()
+    return is_valid
 
-    def is_valid(val, index):
-        if index == 0 or index == len(data.values) - 1:
-            return False
-        else:
-            return max(val[index] - val[index - 1], val[index + 1] - val[index]) < \
-                    2 * min(val[index] - val[index - 1], val[index + 1] - val[index])
 
-    values = np.array(data.values)[:, 0]
-    return [is_valid(values, i) for i in range(0, len(data.values))]
-
-
-def initial_flags_for_historical_test(qc_input: QCInput, historical_size: int,
-                                      allowed_frequency_difference: float = 2.1) -> np.ndarray:
+def initial_flags_for_historical_test(qc_input: QCInputLike, historical_size: int,
+                                      allowed_frequency_difference: float = 2.1,
+                                      max_gap: Optional[float] = None) -> np.ndarray:
     """When a test requires a number of historical points these should be reasonable close in time, also the points that
-    don't have enough historical points should be marked as cannot run (qc=0)"""
-
-    time_stamps = np.array(qc_input.values)[:, 0]
-    flags = np.zeros(len(time_stamps), dtype=int)
+    don't have enough historical points should be marked as cannot run (qc=0). With max_gap, the historical points also
+    have to be in the segment of the point (utils.segments).
+    The flags are computed once per input and window size, tests can modify the returned copy"""
+    qc_input = as_columnar(qc_input)
+    flags = qc_input.cached(('initial_flags_for_historical_test', historical_size, allowed_frequency_difference,
+                             max_gap),
+                            lambda: _initial_flags_for_historical_test(qc_input, historical_size,
+                                                                       allowed_frequency_difference, max_gap))
+    return flags.copy()
+
+
+def _initial_flags_for_historical_test(qc_input: ColumnarQCInput, historical_size: int,
+                                       allowed_frequency_difference: float, max_gap: Optional[float]) -> np.ndarray:
+    time_diffs, size = qc_input.time_diffs, len(qc_input)
+    flags = empty_flags(size)
+    if size <= historical_size:
+        return flags
 
     # Instantiate the flags as (qc=1) if it is possible to run the test, otherwise leave as (qc=0)
-    time_diff_arrays = [np.diff(np.array(time_stamps[i - historical_size: i + 1]))
-                        for i in range(historical_size, len(time_stamps))]
-    timestamps_are_consecutive = [all(time_diffs < allowed_frequency_difference * np.median(time_diffs))
-                                  for time_diffs in time_diff_arrays]
-    flags[[False] * historical_size + timestamps_are_consecutive] = 1
+    # Row j holds the time steps between the points j, ..., j + historical_size
+    time_diff_windows = sliding_window_view(time_diffs, historical_size)
+    median_time_diff = np.median(time_diff_windows, axis=-1)
+    timestamps_are_consecutive = np.all(time_diff_windows < allowed_frequency_difference * median_time_diff[:, None],
+                                        axis=-1)
+    flags[historical_size:][timestamps_are_consecutive] = 1
+    flags[~is_within_segments(qc_input, historical_size, max_gap)] = 0
 
     return flags
 
 
-def assert_is_sorted(data: QCInput):
+def assert_is_sorted(data: QCInputLike):
+    if isinstance(data, ColumnarQCInput):
+        assert data.timestamps[0] <= data.timestamps[-1], f"Input data has to be sorted ascending: {data.timestamps}"
+        return
     assert data.values[0][0] <= data.values[-1][0], f"Input data has to be sorted ascending: {data.values}"
     if data.locations is not None and len(data.locations) > 1:
         assert data.locations[0][0] <= data.locations[-1][0], f"Input data has to be sorted ascending: {data.locations}"
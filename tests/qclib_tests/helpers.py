@@ -0,0 +1,33 @@
+"""
+Random input shared by the tests
+"""
+import random
+from datetime import datetime, timedelta
+
+from qclib.utils.qc_input import QCInput
+
+
+def make_random_data(seed, size, none_fraction=0.1):
+    rnd = random.Random(seed)
+    time_stamp = datetime(2018, 4, 10, 17, 45)
+    value = 10.
+    values = []
+    for _ in range(size):
+        time_stamp += timedelta(seconds=rnd.choice([60, 60, 60, 61, 59, 20, 130, 600]))
+        r = rnd.random()
+        if r < none_fraction:
+            values.append((time_stamp, None))
+        elif r < 0.3:
+            values.append((time_stamp, value))
+        elif r < 0.4:
+            values.append((time_stamp, value + rnd.choice([-8., 8., 50.])))
+        else:
+            value = round(value + rnd.gauss(0, 0.5), 2)
+            values.append((time_stamp, value))
+    return QCInput(values=values, locations=None)
+
+
+def make_random_input(seed, size):
+    data = make_random_data(seed, size)
+    locations = [(time_stamp, 10.7 + i * 0.01, 61 + i * 0.01) for i, (time_stamp, _) in enumerate(data.values)]
+    return QCInput(values=data.values, locations=locations)
@@ -0,0 +1,47 @@
+import random
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+
+import qclib.QC as QC
+from qclib.utils.qc_input import QCInput
+from qclib_tests.helpers import make_random_input
+
+measurement_tests = {"temperature": ["local_range_test", "global_range_test", "argo_spike_test", "frozen_test"],
+                     "depth": ["flatness_test", "missing_value_test"],
+                     "velocity": ["bounded_variance_test"]}
+
+
+class ExecuteChunkedTests(unittest.TestCase):
+
+    def test_chunked_execution_gives_same_flags_as_execute(self):
+        platform = QC.init('TF')
+        for seed in range(10):
+            data = make_random_input(seed, 150)
+            chunk_size = random.Random(seed).choice([1, 2, 3, 5, 17, 200])
+            for measurement_name, tests in measurement_tests.items():
+                assert QC.execute_chunked(platform, data, measurement_name, tests, chunk_size=chunk_size) == \
+                       QC.execute(platform, data, measurement_name, tests), (seed, chunk_size, measurement_name)
+            pump = QCInput(values=[(t, None if v is None else float(int(v) % 2)) for t, v in data.values],
+                           locations=data.locations)
+            assert QC.execute_chunked(platform, pump, "pump", ["pump_history_test"], chunk_size=chunk_size) == \
+                   QC.execute(platform, pump, "pump", ["pump_history_test"])
+
+    def test_chunks_run_in_a_process_pool(self):
+        platform = QC.init('Survey_2019_04/SeaGlider_1')
+        data = make_random_input(1, 1000)
+        tests = measurement_tests["temperature"]
+
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            flags = QC.execute_chunked(platform, data, "temperature", tests, chunk_size=100, executor=executor)
+        assert flags == QC.execute(platform, data, "temperature", tests)
+
+    def test_input_without_values(self):
+        data = make_random_input(2, 3)
+        data = QCInput(values=[(t, None) for t, _ in data.values], locations=data.locations)
+
+        assert QC.execute_chunked(QC.init('TF'), data, "temperature", ["frozen_test"]) == \
+               {"frozen_test": [None, None, None]}
+
+
+if __name__ == '__main__':
+    unittest.main()
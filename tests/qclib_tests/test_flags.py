@@ -0,0 +1,110 @@
+import random
+import unittest
+
+import numpy as np
+
+import qclib.QC as QC
+from qclib.PlatformQC import PlatformQC
+from qclib.QCTests import QCTests
+from qclib.utils.flags import NO_DATA, flags_to_array, flags_to_list
+from qclib_tests.helpers import make_random_input
+
+
+def get_overall_flag_with_object_arrays(flags, *extra_flag_lists):
+    """get_overall_flag as it was before the flags were int8 arrays"""
+    list_of_flags_lists = list(flags.values())
+    if list_of_flags_lists:
+        list_of_flags_lists_t = np.array(list_of_flags_lists).T
+        flag_none = np.any(list_of_flags_lists_t == None, axis=1)
+        if not all(flag_none == np.all(list_of_flags_lists_t == None, axis=1)):
+            raise Exception('If there is any None in a flag array they should all be None')
+    for extra_flag_list in extra_flag_lists:
+        if extra_flag_list is not None:
+            list_of_flags_lists.append(extra_flag_list)
+
+    list_of_flags_lists_t = np.array(list_of_flags_lists).T
+    if list_of_flags_lists_t.ndim <= 1:
+        return list_of_flags_lists
+    overall_flag = np.ones(len(list_of_flags_lists_t))
+    overall_flag[np.any(list_of_flags_lists_t == -1, axis=1)] = -1
+    overall_flag[np.any(list_of_flags_lists_t == None, axis=1)] = None
+    return [flag if flag in [-1, 0, 1] else None for flag in overall_flag.tolist()]
+
+
+def make_random_flags(seed, size, number_of_tests=4):
+    """Flags of the tests of one measurement, None at the same points, and GPS and pump flags"""
+    rnd = random.Random(seed)
+    no_data = [rnd.random() < 0.1 for _ in range(size)]
+    flags = {f"test_{i}": [None if no_data[j] else rnd.choice([-1, 0, 1, 1, 1]) for j in range(size)]
+             for i in range(number_of_tests)}
+    extra_flags = [[rnd.choice([None, -1, 0, 1, 1, 1]) for _ in range(size)] for _ in range(2)]
+    return flags, extra_flags
+
+
+tests = ["local_range_test", "global_range_test", "argo_spike_test", "frozen_test", "missing_value_test"]
+
+
+class FlagArrayTests(unittest.TestCase):
+
+    def test_conversion_between_lists_and_arrays(self):
+        flags = flags_to_array([1, None, -1, 0])
+
+        assert flags.dtype == np.int8
+        assert flags.tolist() == [1, NO_DATA, -1, 0]
+        assert flags_to_list(flags) == [1, None, -1, 0]
+        assert flags_to_list(flags_to_array([1, 0])) == [1, 0]
+
+    def test_tests_return_int8_arrays_with_as_array(self):
+        data = make_random_input(7, 50)
+        for test, kwargs in [(QCTests.frozen_test, {}), (QCTests.flatness_test, {'max_variance': 0.1}),
+                             (QCTests.bounded_variance_test, {'max_variance': 0.1})]:
+            flags = test(data, as_array=True, **kwargs)
+            assert flags.dtype == np.int8
+            assert flags.tolist() == test(data, **kwargs)
+
+    def test_execute_with_as_array_gives_the_flags_of_execute(self):
+        platform = QC.init('TF')
+        data = make_random_input(8, 200)
+        flags = QC.execute(platform, data, "temperature", tests)
+        flag_arrays = QC.execute(platform, data, "temperature", tests, as_array=True)
+
+        for test in tests:
+            assert flag_arrays[test].dtype == np.int8
+            assert flags_to_list(flag_arrays[test]) == flags[test]
+        chunked = QC.execute_chunked(platform, data, "temperature", tests, chunk_size=30, as_array=True)
+        assert all(np.array_equal(chunked[test], flag_arrays[test]) for test in tests)
+
+    def test_combined_flag_of_arrays(self):
+        flags = [[0, 1, 1, 0], [0, 0, -1, 1]]
+
+        assert PlatformQC.get_combined_flag(flags) == [0, 1, -1, 1]
+        combined = PlatformQC.get_combined_flag([flags_to_array(flag) for flag in flags], as_array=True)
+        assert combined.dtype == np.int8 and combined.tolist() == [0, 1, -1, 1]
+
+    def test_overall_flag_of_arrays(self):
+        flags = {'a': [1, -1, None, 0], 'b': [1, 1, None, 0]}
+        extra = [1, 1, 1, None]
+
+        overall = PlatformQC.get_overall_flag(flags, extra, None, as_array=True)
+        assert overall.dtype == np.int8
+        assert flags_to_list(overall) == PlatformQC.get_overall_flag(flags, extra, None) == [1, -1, None, None]
+        with self.assertRaises(Exception):
+            PlatformQC.get_overall_flag({'a': [1, None], 'b': [1, 1]}, as_array=True)
+
+    def test_flag2copernicus_of_arrays(self):
+        flags = flags_to_array([1, -1, 0, None])
+
+        assert flags_to_list(PlatformQC.flag2copernicus(flags, as_array=True)) == [1, 4, 0, None]
+
+    def test_overall_flag_is_the_same_as_with_object_arrays(self):
+        for seed in range(20):
+            flags, extra_flags = make_random_flags(seed, random.Random(seed).randint(0, 50))
+            for extra in [[], extra_flags[:1], extra_flags, [None, extra_flags[0]]]:
+                assert PlatformQC.get_overall_flag(flags, *extra) == get_overall_flag_with_object_arrays(flags, *extra)
+            assert PlatformQC.get_overall_flag({}, *extra_flags) == \
+                   get_overall_flag_with_object_arrays({}, *extra_flags)
+        assert PlatformQC.get_overall_flag({}) == []
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+
+import numpy as np
+
+from qclib.QCTests import QCTests
+from qclib.utils.months import ALL_MONTHS, is_in_months, month_mask, month_table
+from qclib.utils.qc_input import ColumnarQCInput
+
+
+class MonthTests(unittest.TestCase):
+
+    def test_month_mask(self):
+        assert month_mask([1, 2, 10, 11, 12]) == 0b111000000011
+        assert month_mask(range(1, 13)) == ALL_MONTHS
+        assert month_table(month_mask([3, 4])).tolist() == [False, False, False, True, True] + [False] * 8
+        with self.assertRaises(ValueError):
+            month_mask([0])
+
+    def test_is_in_months_is_the_same_as_isin(self):
+        rnd = np.random.default_rng(0)
+        months = rnd.integers(1, 13, size=1000).astype(np.uint8)
+        for _ in range(20):
+            month_set = rnd.choice(np.arange(1, 13), size=rnd.integers(0, 13), replace=False).tolist()
+            assert np.array_equal(is_in_months(months, month_mask(month_set)), np.isin(months, month_set))
+
+    def test_months_of_input(self):
+        timestamps = np.array(['2019-01-31T23:59', '2019-02-01', '2020-12-31T12:00'], dtype='datetime64[ns]')
+        data = ColumnarQCInput(timestamps, [1., 2., 3.])
+
+        assert data.months.dtype == np.uint8 and data.months.tolist() == [1, 2, 12]
+        assert QCTests.range_test(data, min=0, max=10, months=[2, 12]) == [0, 1, 1]
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,9 @@
 import unittest
 from datetime import datetime, timedelta
 import numpy as np
-from qclib.utils.navigation import velocity, KNOT2MPS, velocity_from_location_list
+import qclib.QC as QC
+from qclib.utils.navigation import velocity, KNOT2MPS, velocity_from_location_list, velocity_qc_input
+from qclib.utils.qc_input import ColumnarQCInput
 from qclib_tests.testdata import velocity_test_data
 
 
@@ -44,3 +46,22 @@ class Tests(unittest.TestCase):
         test_data = velocity_test_data.test_data_with_nones
         print()
         assert all(np.isclose(a, b) for a, b in zip(ref_vel, velocity_from_location_list(test_data)) if not np.isnan(a))
+
+    def test_velocity_calculation_with_datetime64(self):
+        time, lon, lat = make_toy_data()
+        lat[3] = np.nan
+
+        velocities = velocity(np.array(time, dtype='datetime64[ns]'), lon, lat)
+        assert np.array_equal(velocities, velocity(time, lon.tolist(), [None if np.isnan(x) else x for x in lat]),
+                              equal_nan=True)
+        assert np.isnan(velocities[2:4]).all() and not np.isnan(velocities[4:]).any()
+
+    def test_velocity_qc_input(self):
+        time, lon, lat = make_toy_data()
+        lat[3] = np.nan
+        data = velocity_qc_input(ColumnarQCInput(time, np.zeros(len(time)), lon, lat))
+
+        assert len(data) == len(time) - 1 and data.timestamps[0] == np.datetime64(time[1])
+        assert data.mask.tolist() == [True, True, False, False] + [True] * 5
+        flags = QC.execute(QC.init('TF'), data, "velocity", ["global_range_test", "bounded_variance_test"])
+        assert flags["global_range_test"] == [1, 1, None, None, 1, 1, 1, 1, 1]
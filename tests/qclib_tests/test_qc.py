@@ -3,9 +3,11 @@ import os
 import time
 import unittest
 from datetime import datetime, timedelta
+from unittest import mock
 import pytest
 
 import qclib.utils.Thresholds
+import qclib.utils.region_index
 import qclib.QC as QC
 from qclib.utils.qc_input import QCInput
 from qclib.PlatformQC import PlatformQC
@@ -186,6 +188,29 @@ class Tests(unittest.TestCase):
         assert flags["pump_history_test"] == [-1, None, -1, None, -1, None, -1, None, -1, None, -1, None, -1, None, -1,
                                               None, -1, None, 1, None, 1, None, 1, None, 1], "pump_history_test_failed"
 
+    def test_execute_many_gives_same_flags_as_execute(self):
+        data = make_toy_data(60)
+        timestamps = [value[0] for value in data.values]
+        longitudes = [location[1] for location in data.locations]
+        latitudes = [location[2] for location in data.locations]
+        values = {"temperature": [None if i % 7 == 3 else 10 + (i % 5) for i in range(60)],
+                  "salinity": [35.] * 60,
+                  "chla_fluorescence": [None if i % 5 == 1 else 1. * i for i in range(60)]}
+        tests = {"temperature": ["local_range_test", "global_range_test", "argo_spike_test", "frozen_test"],
+                 "salinity": ["local_range_test", "frozen_test"],
+                 "chla_fluorescence": ["local_range_test", "global_range_test"]}
+
+        with mock.patch('qclib.utils.region_index.points_inside_polygon',
+                        wraps=qclib.utils.region_index.points_inside_polygon) as points_inside_polygon:
+            flags = QC.execute_many(QC.init(platform_code), timestamps, values, tests, longitudes, latitudes)
+        # the 5 distinct regions of the local range thresholds are looked up once for the 3 measurements
+        assert points_inside_polygon.call_count == 5
+
+        for measurement_name, measurement_tests in tests.items():
+            qc_input = QCInput(values=list(zip(timestamps, values[measurement_name])), locations=data.locations)
+            assert flags[measurement_name] == QC.execute(QC.init(platform_code), qc_input, measurement_name,
+                                                         measurement_tests)
+
     def test_overall_flag(self):
         """Tests final flag when gps and frozen_tests are both -1"""
         flags = {'frozen_test': [-1, -1, -1],
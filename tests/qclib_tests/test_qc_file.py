@@ -0,0 +1,140 @@
+import importlib.util
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+import qclib.QC as QC
+from qclib.QCFile import _PendingRows, execute_file, read_batches
+from qclib.utils.qc_input import QCInput
+from qclib_tests.helpers import make_random_input
+
+tests = {"temperature": ["local_range_test", "global_range_test", "argo_spike_test", "frozen_test"],
+         "salinity": ["global_range_test", "argo_spike_test"],
+         "depth": ["flatness_test"]}
+
+
+def make_frame(seed, size):
+    temperature = make_random_input(seed, size)
+    salinity = make_random_input(seed + 1, size)
+    depth = make_random_input(seed + 2, size)
+    return pd.DataFrame({'time': [time_stamp for time_stamp, _ in temperature.values],
+                         'lon': [lon for _, lon, _ in temperature.locations],
+                         'lat': [lat for _, _, lat in temperature.locations],
+                         'temperature': [np.nan if value is None else value for _, value in temperature.values],
+                         'sal': [np.nan if value is None else value + 25 for _, value in salinity.values],
+                         # flat at the start, where the first batches have less values than the window of flatness_test
+                         'depth': [5., 5.] + [np.nan if value is None else value for _, value in depth.values[2:]]})
+
+
+def expected_flags(frame, measurement_name, column):
+    values = [(time_stamp.to_pydatetime(), None if np.isnan(value) else value)
+              for time_stamp, value in zip(frame['time'], frame[column])]
+    locations = [(time_stamp.to_pydatetime(), lon, lat) for time_stamp, lon, lat in
+                 zip(frame['time'], frame['lon'], frame['lat'])]
+    return QC.execute(QC.init('TF'), QCInput(values=values, locations=locations), measurement_name,
+                      tests[measurement_name])
+
+
+class QCFileTests(unittest.TestCase):
+
+    def assert_file_flags(self, frame, result):
+        assert len(result) == len(frame)
+        assert np.array_equal(result['sal'].to_numpy(), frame['sal'].to_numpy(), equal_nan=True)
+        for measurement_name, column in [("temperature", "temperature"), ("salinity", "sal"), ("depth", "depth")]:
+            flags = expected_flags(frame, measurement_name, column)
+            for test in tests[measurement_name]:
+                written = [None if pd.isna(flag) else int(flag)
+                           for flag in result[f"{measurement_name}_{test}"].tolist()]
+                assert written == flags[test], (measurement_name, test)
+
+    def run_pipeline(self, suffix, batch_size, write):
+        frame = make_frame(4, 300)
+        # the flags are compared with QC.execute on the data as read from the file
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, "source" + suffix)
+            destination = os.path.join(directory, "flags" + suffix)
+            write(frame, source)
+            frame = pd.concat(list(read_batches(source)), ignore_index=True)
+            frame['time'] = pd.to_datetime(frame['time'])
+            number_of_rows = execute_file(QC.init('TF'), source, destination, tests,
+                                          value_columns={"salinity": "sal"}, longitude_column='lon',
+                                          latitude_column='lat', batch_size=batch_size)
+            result = pd.concat(list(read_batches(destination)), ignore_index=True)
+        assert number_of_rows == len(frame)
+        self.assert_file_flags(frame, result)
+
+    def test_csv_file_gives_same_flags_as_execute(self):
+        for batch_size in [1, 4, 7, 50, 1000]:
+            self.run_pipeline(".csv", batch_size, lambda frame, path: frame.to_csv(path, index=False))
+
+    @unittest.skipUnless(importlib.util.find_spec("pyarrow"), "pyarrow is not installed")
+    def test_parquet_file_gives_same_flags_as_execute(self):
+        self.run_pipeline(".parquet", 64, lambda frame, path: frame.to_parquet(path, index=False))
+
+    def test_rows_after_a_sensor_stops_are_not_held_in_memory(self):
+        frame = make_frame(5, 400)
+        # argo_spike_test waits for the next temperature, which never comes after row 20
+        frame.loc[20:, 'temperature'] = np.nan
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, "source.csv")
+            destination = os.path.join(directory, "flags.csv")
+            frame.to_csv(source, index=False)
+            frame = pd.read_csv(source, parse_dates=['time'])
+            # the rows and the flags of each test are pending, at most a batch of each is held in memory
+            rows_in_memory = {}
+            append = _PendingRows.append
+
+            def recording_append(pending, pending_frame):
+                append(pending, pending_frame)
+                rows_in_memory[id(pending)] = max(rows_in_memory.get(id(pending), 0), pending.number_of_rows_in_memory)
+
+            with mock.patch.object(_PendingRows, 'append', recording_append):
+                execute_file(QC.init('TF'), source, destination, tests, value_columns={"salinity": "sal"},
+                             longitude_column='lon', latitude_column='lat', batch_size=8)
+            result = pd.read_csv(destination)
+        self.assert_file_flags(frame, result)
+        assert len(rows_in_memory) == 1 + sum(len(measurement_tests) for measurement_tests in tests.values())
+        assert max(rows_in_memory.values()) <= 8
+
+    def test_pending_rows_beyond_max_rows_in_memory_are_kept_in_a_file(self):
+        frame = make_frame(6, 200)
+        rows = _PendingRows(max_rows_in_memory=16)
+        for start in range(0, 200, 8):
+            rows.append(frame.iloc[start:start + 8])
+            assert rows.number_of_rows_in_memory <= 16
+        popped = list(rows.pop(5)) + list(rows.pop(150))
+        assert rows.number_of_rows_in_memory <= 16 and len(rows) == 45
+        rows.append(frame.iloc[:0])
+        popped += list(rows.pop(45))
+        rows.close()
+
+        assert len(rows) == 0
+        assert pd.concat(popped, ignore_index=True).equals(frame)
+
+    @unittest.skipIf(importlib.util.find_spec("pyarrow"), "pyarrow is installed")
+    def test_parquet_file_without_pyarrow(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, "source.csv")
+            make_frame(1, 25).to_csv(source, index=False)
+            for destination in ["flags.parquet", "flags.arrow"]:
+                with self.assertRaisesRegex(ImportError, "pip install pyarrow"):
+                    execute_file(QC.init('TF'), source, os.path.join(directory, destination), tests,
+                                 value_columns={"salinity": "sal"}, longitude_column='lon', latitude_column='lat')
+                assert not os.path.exists(os.path.join(directory, destination))
+            with self.assertRaisesRegex(ImportError, "pip install pyarrow"):
+                list(read_batches(os.path.join(directory, "source.parquet")))
+
+    def test_batches_of_csv_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "data.csv")
+            make_frame(1, 25).to_csv(path, index=False)
+
+            assert [len(batch) for batch in read_batches(path, batch_size=10)] == [10, 10, 5]
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+import os
+import pickle
+import unittest
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+import qclib.QC as QC
+from qclib.QCTests import QCTests
+from qclib.utils.qc_input import QCInput, ColumnarQCInput, to_datetime64
+from qclib.utils.qc_input_helpers import remove_nans, flags_resized_to_include_values_for_nan
+from qclib_tests.test_qc import ORIGIN_DIR, read_testdata, make_toy_data_with_nan
+
+base_time = datetime(2017, 1, 12, 14, 8, 6)
+d = timedelta(seconds=60)
+
+
+def read_ferrybox_data():
+    input_data = read_testdata(os.path.join(ORIGIN_DIR, "ferrybox_data.csv"))
+    values = [(datetime.strptime(item[0].split('.')[0], '%Y-%m-%dT%H:%M:%S'), float(item[1])) for item in input_data]
+    locations = [(datetime.strptime(item[0].split('.')[0], '%Y-%m-%dT%H:%M:%S'), float(item[5]), float(item[6]))
+                 for item in input_data]
+    return QCInput(values=values, locations=locations)
+
+
+class ColumnarQCInputTests(unittest.TestCase):
+
+    def test_from_qc_input(self):
+        data = ColumnarQCInput.from_qc_input(make_toy_data_with_nan(6))
+
+        assert len(data) == 6
+        assert data.timestamps.dtype == np.dtype('datetime64[ns]')
+        assert data.timestamps[0] == np.datetime64(base_time + d)
+        assert np.isnan(data.values[2])
+        assert data.mask.tolist() == [True, True, False, True, True, True]
+        assert data.has_locations and data.longitudes.dtype == np.float64
+
+    def test_mask_keeps_nan_that_is_not_none(self):
+        values = [(base_time, 1.), (base_time + d, float('nan')), (base_time + 2 * d, None)]
+        data = ColumnarQCInput.from_qc_input(QCInput(values=values, locations=None))
+
+        assert data.mask.tolist() == [True, True, False]
+        assert not data.has_locations
+
+    def test_timezone_aware_timestamps_are_converted_to_utc(self):
+        values = [(datetime(2020, 1, 1, 1, tzinfo=timezone(timedelta(hours=2))), 1.)]
+        data = ColumnarQCInput.from_qc_input(QCInput(values=values, locations=None))
+
+        assert data.timestamps[0] == np.datetime64('2019-12-31T23:00')
+        # the month of the range tests is the month in the timezone of the timestamp
+        assert data.months.tolist() == [1]
+        assert QCTests.range_test(data, min=0, max=0.5, months=[1]) == [-1]
+        assert QCTests.range_test(data, min=0, max=0.5, months=[12]) == [0]
+
+    def test_local_months_are_kept_by_selected_concatenated_and_pickled_inputs(self):
+        values = [(datetime(2020, 1, 1, 1, tzinfo=timezone(timedelta(hours=2))), 1.),
+                  (datetime(2020, 1, 1, 3, tzinfo=timezone(timedelta(hours=2))), None)]
+        data = ColumnarQCInput.from_qc_input(QCInput(values=values, locations=None))
+
+        for other in [data[:1], data.compress(data.mask), data.with_values([2., 3.]), pickle.loads(pickle.dumps(data)),
+                      ColumnarQCInput.concatenate([data, data[:1]])]:
+            assert set(other.months.tolist()) == {1}
+        naive = ColumnarQCInput([datetime(2020, 1, 1, 4)], [1.])
+        with self.assertRaises(ValueError):
+            ColumnarQCInput.concatenate([data, naive])
+
+    def test_execute_gives_same_flags_for_both_input_types(self):
+        qc_input = read_ferrybox_data()
+        tests = ["global_range_test", "frozen_test", "argo_spike_test", "local_range_test"]
+
+        flags = QC.execute(QC.init('TF'), qc_input, measurement_name="salinity", tests=tests)
+        columnar_flags = QC.execute(QC.init('TF'), ColumnarQCInput.from_qc_input(qc_input),
+                                    measurement_name="salinity", tests=tests)
+
+        assert flags == columnar_flags
+
+    def test_tests_accept_columnar_input(self):
+        values = np.array([1., 1., 1., 1., 1., 2.])
+        timestamps = np.datetime64('2019-01-01T00:00') + np.arange(6) * np.timedelta64(60, 's')
+        data = ColumnarQCInput(timestamps=timestamps, values=values)
+
+        assert QCTests.frozen_test(data) == [0, 0, 0, 0, -1, 1]
+        assert QCTests.missing_value_test(data, nan=2.) == [1, 1, 1, 1, 1, -1]
+
+    def test_remove_nans_and_resize_flags(self):
+        qc_input = make_toy_data_with_nan(6)
+        columnar = ColumnarQCInput.from_qc_input(qc_input)
+
+        without_nans = remove_nans(qc_input)
+        assert [value[1] for value in without_nans.values] == [1, 2, 3, 4, 5]
+        assert without_nans.locations == qc_input.locations[:2] + qc_input.locations[3:]
+        columnar_without_nans = remove_nans(columnar)
+        assert columnar_without_nans.values.tolist() == [1, 2, 3, 4, 5]
+        # nothing to remove, the input is returned as is
+        assert remove_nans(columnar_without_nans) is columnar_without_nans
+
+        flags = {'frozen_test': [1, 2, 3, 4, 5]}
+        assert flags_resized_to_include_values_for_nan(flags, qc_input) == {'frozen_test': [1, 2, None, 3, 4, 5]}
+        assert flags_resized_to_include_values_for_nan(flags, columnar) == {'frozen_test': [1, 2, None, 3, 4, 5]}
+
+    def test_constructor_validates_shapes(self):
+        timestamps = np.datetime64('2019-01-01T00:00') + np.arange(3) * np.timedelta64(60, 's')
+
+        with self.assertRaises(ValueError):
+            ColumnarQCInput(timestamps=timestamps, values=[1., 2.])
+        with self.assertRaises(ValueError):
+            ColumnarQCInput(timestamps=timestamps, values=[1., 2., 3.], longitudes=[10., 10., 10.])
+        with self.assertRaises(ValueError):
+            ColumnarQCInput(timestamps=timestamps, values=[1., 2., 3.], mask=[True])
+
+    def test_from_arrays_uses_the_arrays_as_they_are(self):
+        timestamps = np.datetime64('2019-01-01T00:00', 'ns') + np.arange(3) * np.timedelta64(60, 's')
+        values = np.array([1., np.nan, 3.])
+        data = ColumnarQCInput.from_arrays(timestamps=timestamps, values=values)
+
+        assert data.timestamps is timestamps and data.values is values
+        assert data.mask.tolist() == [True, False, True]
+
+    def test_internal_path_gives_the_columns_of_validation(self):
+        values = [(base_time + i * d, float(i)) for i in range(100)]
+        locations = [(base_time + i * d, 10., 60.) for i in range(100)]
+        validated = ColumnarQCInput.from_qc_input(QCInput(values=values, locations=locations))
+        columnar = ColumnarQCInput.from_qc_input(QCInput.construct(values=values, locations=locations))
+
+        for column in ['timestamps', 'values', 'longitudes', 'latitudes', 'mask']:
+            assert np.array_equal(getattr(columnar, column), getattr(validated, column))
+
+    def test_mixed_naive_and_aware_timestamps_are_rejected(self):
+        for timestamps in [[base_time, base_time.replace(tzinfo=timezone.utc)],
+                           [base_time.replace(tzinfo=timezone.utc), base_time]]:
+            with self.assertRaisesRegex(ValueError, "timezone"):
+                to_datetime64(timestamps)
+
+
+if __name__ == '__main__':
+    unittest.main()
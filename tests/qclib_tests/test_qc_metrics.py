@@ -0,0 +1,88 @@
+import io
+import tracemalloc
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import qclib.QC as QC
+from qclib.QCMetrics import QCMeasurement, QCMetricsAggregator, measured, timed
+from qclib_tests.helpers import make_random_input
+
+tests = ["global_range_test", "local_range_test", "argo_spike_test", "frozen_test"]
+
+
+class QCMetricsTests(unittest.TestCase):
+
+    def test_execute_records_every_stage_and_test(self):
+        data = make_random_input(1, 300)
+        metrics = QCMetricsAggregator()
+        flags = QC.execute(QC.init('TF'), data, "temperature", tests, metrics=metrics)
+
+        assert flags == QC.execute(QC.init('TF'), data, "temperature", tests)
+        stages = {stage for stage, _ in metrics.measurements}
+        assert stages == {'execute', 'as_columnar', 'assert_is_sorted', 'remove_nans', 'applyQC', 'test',
+                          'flags_of_all_rows', 'as_lists'}
+        for test in tests:
+            [measurement] = metrics.measurements[('test', test)]
+            assert measurement.size == sum(value[1] is not None for value in data.values) and measurement.seconds > 0
+            assert measurement.allocated_bytes is None
+        [execute] = metrics.measurements[('execute', "temperature")]
+        assert execute.size == 300
+        assert execute.seconds >= sum(metrics.seconds('test', test)[0] for test in tests)
+
+    def test_tests_run_by_an_executor_are_recorded(self):
+        data = make_random_input(2, 100)
+        metrics = QCMetricsAggregator()
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            flags = QC.init('TF').applyQC(data, "temperature", tests, executor=executor, metrics=metrics)
+
+        assert flags == QC.init('TF').applyQC(data, "temperature", tests)
+        assert sorted(name for stage, name in metrics.measurements if stage == 'test') == sorted(tests)
+
+    def test_allocated_memory_of_nested_stages(self):
+        def allocate(size):
+            return np.ones(size)
+
+        def allocate_twice():
+            first = measured(metrics, 'inner', 'a', 0, allocate, 1000000)
+            del first
+            return measured(metrics, 'inner', 'b', 0, allocate, 10000)
+
+        metrics = QCMetricsAggregator()
+        tracemalloc.start()
+        try:
+            measured(metrics, 'outer', 'c', 0, allocate_twice)
+        finally:
+            tracemalloc.stop()
+
+        [first], [second] = metrics.measurements[('inner', 'a')], metrics.measurements[('inner', 'b')]
+        [outer] = metrics.measurements[('outer', 'c')]
+        assert 8e6 <= first.allocated_bytes < 8.1e6
+        assert 8e4 <= second.allocated_bytes < 8.1e4
+        # the peak of the first inner stage is not lost when the second one resets it
+        assert outer.allocated_bytes >= first.allocated_bytes
+
+    def test_timed_without_tracemalloc(self):
+        result, seconds, allocated_bytes = timed(sum, [1, 2])
+
+        assert result == 3 and seconds >= 0 and allocated_bytes is None
+
+    def test_aggregator_summary_and_histogram(self):
+        metrics = QCMetricsAggregator()
+        for seconds in [0.001, 0.002, 0.004, 0.1]:
+            metrics(QCMeasurement('test', 'frozen_test', 1000, seconds, None))
+
+        summary = metrics.summary()[('test', 'frozen_test')]
+        assert summary['count'] == 4 and np.isclose(summary['total_seconds'], 0.107)
+        assert np.isclose(summary['points_per_second'], 4000 / 0.107)
+        counts, edges = metrics.histogram('test', 'frozen_test', bins=4)
+        assert counts.sum() == 4 and counts[0] == 2 and counts[-1] == 1
+        assert edges[0] <= 0.001 and edges[-1] >= 0.1
+        output = io.StringIO()
+        metrics.dump(output)
+        assert output.getvalue().startswith("test frozen_test: 4 calls")
+
+
+if __name__ == '__main__':
+    unittest.main()
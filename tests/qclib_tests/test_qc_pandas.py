@@ -0,0 +1,47 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+import qclib.QC as QC
+from qclib.QCPandas import add_qc_flags, qc_flags
+from qclib_tests.test_qc_file import expected_flags, make_frame, tests
+
+
+class QCPandasTests(unittest.TestCase):
+
+    def test_accessor_gives_same_flags_as_execute(self):
+        frame = make_frame(5, 200).set_index('time')
+        flags = frame.qc.flags(QC.init('TF'), tests, value_columns={"salinity": "sal"})
+
+        assert flags.index.equals(frame.index)
+        for measurement_name, column in [("temperature", "temperature"), ("salinity", "sal")]:
+            expected = expected_flags(frame.reset_index(), measurement_name, column)
+            for test in tests[measurement_name]:
+                assert flags[f"{measurement_name}_{test}"].dtype == pd.Int8Dtype()
+                assert [None if pd.isna(flag) else flag for flag in flags[f"{measurement_name}_{test}"]] == \
+                       expected[test]
+
+    def test_add_flags_keeps_the_columns_of_the_frame(self):
+        frame = make_frame(6, 20).set_index('time')
+        with_flags = add_qc_flags(frame, QC.init('TF'), {"temperature": ["global_range_test"]})
+
+        assert list(with_flags.columns) == list(frame.columns) + ["temperature_global_range_test"]
+        assert with_flags[frame.columns].equals(frame)
+        assert frame.qc.add_flags(QC.init('TF'), {"temperature": ["global_range_test"]}).equals(with_flags)
+
+    def test_frame_without_locations_and_timezone_aware_index(self):
+        index = pd.date_range('2020-01-01T01:00', periods=6, freq='1min', tz='Europe/Oslo')
+        frame = pd.DataFrame({'temperature': [1., 1., 1., 1., 1., np.nan]}, index=index)
+        flags = qc_flags(frame, QC.init('TF'), {"temperature": ["frozen_test"]})
+
+        assert [None if pd.isna(flag) else flag for flag in flags["temperature_frozen_test"]] == [0, 0, 0, 0, -1, None]
+        assert flags.index.equals(index)
+
+    def test_frame_has_to_be_indexed_by_time(self):
+        with self.assertRaises(ValueError):
+            qc_flags(make_frame(5, 10), QC.init('TF'), {"temperature": ["frozen_test"]})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,236 @@
+import pickle
+import unittest
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import timedelta, timezone
+
+import numpy as np
+
+import qclib.QC as QC
+import qclib.QCPlan
+from qclib.PlatformQC import PlatformQC
+from qclib.Platforms import FerryboxQC, SeaGliderQC
+from qclib.QCPlan import QCPlan, get_plan, set_plan_cache_size, DEFAULT_PLAN_CACHE_SIZE
+from qclib.QCTests import QCTests
+from qclib.utils.qc_input import QCInput
+from qclib.utils.qc_input_helpers import as_columnar, as_qc_input
+from qclib_tests.helpers import make_random_input
+from qclib_tests.test_qc import make_toy_data
+
+tests = ["global_range_test", "local_range_test", "frozen_test"]
+
+
+def custom_test(data):
+    return [1 for _ in data.values]
+
+
+def custom_threshold_test(data, threshold):
+    assert isinstance(data, QCInput)
+    return [1 if value > threshold else 0 for value in np.array(data.values)[:, 1]]
+
+
+class QCPlanTests(unittest.TestCase):
+
+    def tearDown(self):
+        set_plan_cache_size(DEFAULT_PLAN_CACHE_SIZE)
+
+    def test_plan_is_compiled_once_per_platform_class(self):
+        plan = QC.init('TF').plan("temperature", tests)
+
+        assert QC.init('NB').plan("temperature", list(tests)) is plan
+        assert QC.init('Survey_2019_04/SeaGlider_1').plan("temperature", tests) is not plan
+        assert plan.tests == tuple(tests)
+        assert plan.steps[2].function == QCTests.frozen_test
+
+    def test_plan_gives_same_flags_as_the_tests(self):
+        data = make_toy_data(10)
+        flags = FerryboxQC().applyQC(data, "temperature", tests)
+
+        assert flags["frozen_test"] == QCTests.frozen_test(data)
+        assert flags["global_range_test"] == QCTests.range_test(data, **PlatformQC.default_qc_tests()[
+            "temperature"]["global_range_test"][1])
+
+    def test_instance_with_modified_tests_does_not_use_the_cached_plan(self):
+        data = make_toy_data(10)
+        platform = FerryboxQC()
+        platform.edit_qc_tests()["temperature"]["global_range_test"][1] = {'min': 5, 'max': 100}
+
+        assert platform.applyQC(data, "temperature", ["global_range_test"])["global_range_test"] == [-1] * 5 + [1] * 5
+        assert FerryboxQC().applyQC(data, "temperature", ["global_range_test"])["global_range_test"] == [1] * 10
+        assert FerryboxQC.default_qc_tests()["temperature"]["global_range_test"][1] != {'min': 5, 'max': 100}
+
+    def test_reading_the_tests_does_not_copy_them(self):
+        platform = FerryboxQC()
+        global_range_test = platform.qc_tests["temperature"]["global_range_test"]
+
+        assert platform.qc_tests is FerryboxQC().qc_tests
+        assert global_range_test[1] == PlatformQC.default_qc_tests()["temperature"]["global_range_test"][1]
+        assert platform.plan("temperature", tests) is get_plan(FerryboxQC, "temperature", tests)
+        with self.assertRaises(TypeError):
+            platform.qc_tests["temperature"]["global_range_test"] = [QCTests.range_test, {'min': 5}]
+        platform.edit_qc_tests()["temperature"]["global_range_test"][1] = {'min': 5}
+        assert platform.qc_tests["temperature"]["global_range_test"][1] == {'min': 5}
+        assert platform.plan("temperature", tests) is not get_plan(FerryboxQC, "temperature", tests)
+        with self.assertRaises(AttributeError):
+            QC.init('TF').edit_qc_tests()
+
+    def test_unknown_measurement_uses_default_tests(self):
+        plan = SeaGliderQC().plan("unknown", ["frozen_test"])
+
+        assert plan.measurement_name == "*"
+        with self.assertRaises(Exception):
+            SeaGliderQC().plan("unknown", ["global_range_test"])
+
+    def test_number_of_additional_data_of_plan(self):
+        plan = FerryboxQC().plan("temperature", ["argo_spike_test", "global_range_test"])
+
+        assert (plan.number_of_historical, plan.number_of_future) == (1, 1)
+        assert FerryboxQC().plan("temperature", ["local_range_test"]).number_of_historical == 0
+
+    def test_plan_is_immutable(self):
+        plan = FerryboxQC().plan("temperature", tests)
+
+        with self.assertRaises(AttributeError):
+            plan.steps = ()
+        with self.assertRaises(TypeError):
+            plan.steps[0].kwargs['min'] = 0
+
+    def test_plan_cache_size(self):
+        set_plan_cache_size(1)
+        plan = get_plan(FerryboxQC, "temperature", tests)
+        get_plan(FerryboxQC, "salinity", tests)
+
+        assert get_plan(FerryboxQC, "temperature", tests) is not plan
+        assert qclib.QCPlan._cached_default_plan.cache_info().maxsize == 1
+        assert isinstance(plan, QCPlan)
+
+    def test_local_range_test_takes_a_list_of_range_test_options(self):
+        data = make_toy_data(10)
+        thresholds = [{'min': 0, 'max': 5}, {'min': 2, 'max': 7, 'months': [1, 2, 3]}]
+        platform = FerryboxQC()
+        platform.edit_qc_tests()["temperature"]["local_range_test"][1] = thresholds
+        overridden = QC.init('TF').with_overrides({'temperature': {'local_range_test': thresholds}})
+        expected = PlatformQC.get_combined_flag([QCTests.range_test(data, **options) for options in thresholds])
+
+        assert platform.applyQC(data, "temperature", ["local_range_test"])["local_range_test"] == expected
+        assert overridden.applyQC(data, "temperature", ["local_range_test"])["local_range_test"] == expected
+
+    def test_executors_give_same_flags_as_sequential_execution(self):
+        data = make_random_input(3, 500)
+        all_tests = ["global_range_test", "local_range_test", "argo_spike_test", "frozen_test", "missing_value_test"]
+        platform = FerryboxQC()
+        # options given as a list, the flags of the runs are combined
+        platform.edit_qc_tests()["temperature"]["combined_range_test"] = [QCTests.range_test, [{'min': 0}, {'max': 8}]]
+        expected = QC.execute(platform, data, "temperature", all_tests + ["combined_range_test"])
+
+        for executor_class in [ThreadPoolExecutor, ProcessPoolExecutor]:
+            with executor_class(max_workers=2) as executor:
+                flags = QC.execute(platform, data, "temperature", all_tests + ["combined_range_test"],
+                                   executor=executor)
+            assert flags == expected
+            assert list(flags) == all_tests + ["combined_range_test"]
+
+    def test_custom_test_is_called_without_as_array(self):
+        data = make_random_input(3, 100)
+        platform = FerryboxQC()
+        platform.edit_qc_tests()["temperature"]["custom_test"] = [custom_test, {}]
+        platform.edit_qc_tests()["temperature"]["combined_custom_test"] = [custom_test, [{}, {}]]
+        overridden = platform.with_overrides({'temperature': {'custom_test': {}}})
+        expected = [None if value is None else 1 for _, value in data.values]
+
+        for qc_platform in [platform, overridden]:
+            flags = QC.execute(qc_platform, data, "temperature", ["custom_test", "combined_custom_test"])
+            assert flags == {"custom_test": expected, "combined_custom_test": expected}
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                chunked = QC.execute_chunked(qc_platform, data, "temperature", ["custom_test"], chunk_size=30,
+                                             executor=executor)
+            assert chunked == {"custom_test": expected}
+
+    def test_custom_test_is_given_a_qc_input(self):
+        data = make_random_input(4, 100)
+        aware_data = QCInput(values=[(time_stamp.replace(tzinfo=timezone(timedelta(hours=2))), value)
+                                     for time_stamp, value in data.values], locations=None)
+        platform = FerryboxQC()
+        platform.edit_qc_tests()["temperature"]["custom_test"] = [custom_threshold_test, {'threshold': 10}]
+        expected = [None if value is None else int(value > 10) for _, value in data.values]
+
+        assert QC.execute(platform, data, "temperature", ["custom_test"]) == {"custom_test": expected}
+        assert QC.execute(platform, aware_data, "temperature", ["custom_test"]) == {"custom_test": expected}
+        assert as_qc_input(as_columnar(aware_data)).values == aware_data.values
+
+    def test_pickled_input_does_not_keep_cached_quantities(self):
+        data = as_columnar(make_toy_data(10))
+        selected = data[2:]
+        selected.months
+
+        copied = pickle.loads(pickle.dumps(selected))
+        assert copied._cache == {} and copied._parent is None
+        assert copied.values.tolist() == selected.values.tolist()
+
+
+class SharedPlatformTests(unittest.TestCase):
+
+    def tearDown(self):
+        QC.platform_dict.pop('Test/Ferrybox', None)
+
+    def test_init_returns_shared_frozen_platforms(self):
+        platform = QC.init('TF')
+
+        assert QC.init('TF') is platform and QC.init('NB') is platform
+        assert QC.init('unknown') is QC.init('other unknown') and type(QC.init('unknown')) is PlatformQC
+        assert platform.is_frozen and not FerryboxQC().is_frozen
+        with self.assertRaises(TypeError):
+            platform.qc_tests["temperature"]["global_range_test"] = [QCTests.range_test, {'min': 5}]
+        with self.assertRaises(AttributeError):
+            platform.qc_tests = {}
+        assert platform.qc_tests["temperature"]["global_range_test"][1] == \
+            PlatformQC.default_qc_tests()["temperature"]["global_range_test"][1]
+        assert platform.plan("temperature", tests) is get_plan(FerryboxQC, "temperature", tests)
+
+    def test_register_platform(self):
+        QC.register_platform('Test/Ferrybox', SeaGliderQC)
+
+        assert QC.init('Test/Ferrybox') is QC.init('Survey_2019_04/SeaGlider_1')
+        with self.assertRaises(ValueError):
+            QC.register_platform('Test/Ferrybox', dict)
+
+    def test_platform_with_overrides(self):
+        data = make_toy_data(10)
+        platform = QC.init('TF')
+        overridden = platform.with_overrides({'temperature': {'global_range_test': {'min': 5, 'max': 100}},
+                                              'depth': {'combined_range_test': [QCTests.range_test,
+                                                                                [{'min': 0}, {'max': 8}]]}})
+
+        assert type(overridden) is FerryboxQC and overridden.is_frozen
+        assert overridden.applyQC(data, "temperature", ["global_range_test"])["global_range_test"] == \
+            [-1] * 5 + [1] * 5
+        assert platform.applyQC(data, "temperature", ["global_range_test"])["global_range_test"] == [1] * 10
+        assert overridden.applyQC(data, "depth", ["combined_range_test", "frozen_test"]) == {
+            "combined_range_test": [1] * 9 + [-1], "frozen_test": QCTests.frozen_test(data)}
+        # the tests that are not overridden are shared, the plans are compiled once
+        assert overridden.plan("temperature", ["global_range_test"]) is \
+            overridden.plan("temperature", ["global_range_test"])
+        assert overridden.qc_tests["salinity"] == platform.qc_tests["salinity"]
+        assert QC.execute(pickle.loads(pickle.dumps(overridden)), data, "temperature", ["global_range_test"]) == \
+            QC.execute(overridden, data, "temperature", ["global_range_test"])
+        with self.assertRaises(Exception):
+            platform.with_overrides({'temperature': {'unknown_test': {'min': 0}}})
+
+    def test_overrides_do_not_share_mutable_tests(self):
+        data = make_toy_data(10)
+        platform = FerryboxQC()
+        platform.edit_qc_tests()["salinity"]["global_range_test"][1] = {'min': 5, 'max': 100}
+        options = {'min': 5, 'max': 100}
+        overridden = platform.with_overrides({'temperature': {'global_range_test': options}})
+        expected = {measurement_name: overridden.applyQC(data, measurement_name, ["global_range_test"])
+                    for measurement_name in ["temperature", "salinity"]}
+
+        options['min'] = 0
+        platform.edit_qc_tests()["salinity"]["global_range_test"][1]['min'] = 0
+        assert overridden.qc_tests["salinity"]["global_range_test"][1] == {'min': 5, 'max': 100}
+        assert overridden.qc_tests["temperature"]["global_range_test"][1] == {'min': 5, 'max': 100}
+        assert {measurement_name: overridden.applyQC(data, measurement_name, ["global_range_test"])
+                for measurement_name in ["temperature", "salinity"]} == expected
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import asyncio
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import qclib.QC as QC
+from qclib.QCService import QCService
+from qclib.utils.flags import flags_to_list
+from qclib.utils.qc_input import QCInput
+from qclib_tests.helpers import make_random_input
+
+point_tests = ["global_range_test", "local_range_test", "missing_value_test"]
+window_tests = ["argo_spike_test", "frozen_test"]
+
+
+class CountingExecutor(ThreadPoolExecutor):
+
+    def __init__(self):
+        super().__init__(max_workers=2)
+        self.number_of_calls = 0
+
+    def submit(self, *args, **kwargs):
+        self.number_of_calls += 1
+        return super().submit(*args, **kwargs)
+
+
+def execute_concurrently(service, inputs, tests, platform_code='TF', **options):
+    async def main():
+        return await asyncio.gather(*[service.execute(platform_code, qc_input, "temperature", tests, **options)
+                                      for qc_input in inputs], return_exceptions=True)
+    return asyncio.run(main())
+
+
+class QCServiceTests(unittest.TestCase):
+
+    def test_execute_batch_gives_the_flags_of_execute(self):
+        platform = QC.init('TF')
+        inputs = [make_random_input(seed, size) for seed, size in enumerate([30, 1, 50, 7])]
+        inputs.append(QCInput(values=[(inputs[0].values[0][0], None)], locations=inputs[0].locations[:1]))
+
+        for tests in [point_tests, point_tests + window_tests]:
+            expected = [QC.execute(platform, qc_input, "temperature", tests) for qc_input in inputs]
+            assert QC.execute_batch(platform, inputs, "temperature", tests) == expected
+            arrays = QC.execute_batch(platform, inputs, "temperature", tests, as_array=True)
+            expected = [QC.execute(platform, qc_input, "temperature", tests, as_array=True) for qc_input in inputs]
+            assert all(np.array_equal(flags[test], expected_flags[test])
+                       for flags, expected_flags in zip(arrays, expected) for test in tests)
+
+    def test_concurrent_requests_are_coalesced(self):
+        inputs = [make_random_input(seed, 20) for seed in range(20)]
+        with CountingExecutor() as executor:
+            flags = execute_concurrently(QCService(executor), inputs, point_tests)
+
+            assert executor.number_of_calls == 1
+        assert flags == [QC.execute(QC.init('TF'), qc_input, "temperature", point_tests) for qc_input in inputs]
+
+    def test_batches_are_limited_to_max_batch_size(self):
+        inputs = [make_random_input(seed, 20) for seed in range(10)]
+        with CountingExecutor() as executor:
+            flags = execute_concurrently(QCService(executor, max_batch_size=50), inputs, point_tests, as_array=True)
+
+            assert executor.number_of_calls == 4
+        expected = [QC.execute(QC.init('TF'), qc_input, "temperature", point_tests) for qc_input in inputs]
+        assert [{test: flags_to_list(flag) for test, flag in request_flags.items()}
+                for request_flags in flags] == expected
+
+    def test_requests_of_window_tests_are_not_coalesced(self):
+        inputs = [make_random_input(seed, 20) for seed in range(5)]
+        with CountingExecutor() as executor:
+            flags = execute_concurrently(QCService(executor), inputs, point_tests + window_tests)
+
+            assert executor.number_of_calls == 5
+        assert flags == [QC.execute(QC.init('TF'), qc_input, "temperature", point_tests + window_tests)
+                         for qc_input in inputs]
+
+    def test_invalid_request_does_not_fail_the_batch(self):
+        inputs = [make_random_input(seed, 20) for seed in range(3)]
+        unsorted = QCInput(values=inputs[0].values[::-1], locations=inputs[0].locations[::-1])
+        flags = execute_concurrently(QCService(), [inputs[0], unsorted, inputs[1]], point_tests)
+
+        assert isinstance(flags[1], Exception)
+        assert flags[0] == QC.execute(QC.init('TF'), inputs[0], "temperature", point_tests)
+        assert flags[2] == QC.execute(QC.init('TF'), inputs[1], "temperature", point_tests)
+
+
+if __name__ == '__main__':
+    unittest.main()
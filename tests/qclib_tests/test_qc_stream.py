@@ -0,0 +1,83 @@
+import random
+import unittest
+from datetime import datetime, timedelta
+
+import qclib.QC as QC
+from qclib.QCStream import QCStream
+from qclib.utils.qc_input import QCInput
+from qclib_tests.helpers import make_random_input
+
+
+def split(data: QCInput, sizes):
+    start = 0
+    for size in sizes:
+        yield QCInput(values=data.values[start:start + size], locations=data.locations[start:start + size])
+        start += size
+
+
+class QCStreamTests(unittest.TestCase):
+
+    def assert_stream_matches_execute(self, data, measurement_name, tests, chunk_sizes):
+        stream = QCStream(QC.init('TF'), measurement_name, tests)
+        flags = {test: [] for test in tests}
+        for chunk in split(data, chunk_sizes):
+            for test, chunk_flags in stream.append(chunk).items():
+                flags[test] += chunk_flags
+        for test, chunk_flags in stream.flush().items():
+            flags[test] += chunk_flags
+
+        assert stream.number_of_pending == 0
+        assert flags == QC.execute(QC.init('TF'), data, measurement_name, tests)
+
+    def test_stream_gives_same_flags_as_execute(self):
+        tests = ["local_range_test", "global_range_test", "argo_spike_test", "frozen_test"]
+        for seed in range(20):
+            rnd = random.Random(seed)
+            data = make_random_input(seed, 120)
+            chunk_sizes = [rnd.choice([1, 1, 2, 3, 7, 20]) for _ in range(120)]
+            self.assert_stream_matches_execute(data, "temperature", tests, chunk_sizes)
+            self.assert_stream_matches_execute(data, "velocity", ["bounded_variance_test"], chunk_sizes)
+            self.assert_stream_matches_execute(data, "depth", ["flatness_test"], chunk_sizes)
+            pump = QCInput(values=[(t, None if v is None else float(int(v) % 2)) for t, v in data.values],
+                           locations=data.locations)
+            self.assert_stream_matches_execute(pump, "pump", ["pump_history_test"], chunk_sizes)
+
+    def test_flags_depending_on_future_points_are_deferred(self):
+        time_stamp = datetime(2020, 1, 1)
+        values = [(time_stamp + timedelta(minutes=i), value) for i, value in enumerate([1., 1., 10., None, 1.])]
+        # 10. can not be spike tested, its neighbours with a value are 1 and 2 minutes away
+        stream = QCStream(QC.init('TF'), "temperature", ["argo_spike_test", "global_range_test"])
+
+        assert stream.number_of_historical == 1 and stream.number_of_future == 1
+        assert stream.append(QCInput(values=values[:2], locations=None)) == \
+               {"argo_spike_test": [0], "global_range_test": [1]}
+        assert stream.append(QCInput(values=values[2:4], locations=None)) == \
+               {"argo_spike_test": [1], "global_range_test": [1]}
+        assert stream.number_of_pending == 2
+        assert stream.append(QCInput(values=values[4:], locations=None)) == \
+               {"argo_spike_test": [0, None], "global_range_test": [1, None]}
+        assert stream.flush() == {"argo_spike_test": [0], "global_range_test": [1]}
+        assert stream.flush() == {"argo_spike_test": [], "global_range_test": []}
+
+    def test_rows_without_value_after_a_deferred_point_are_not_kept(self):
+        tests = ["argo_spike_test", "frozen_test"]
+        data = make_random_input(3, 30)
+        time_stamp = data.values[-1][0]
+        tail = [(time_stamp + timedelta(minutes=i + 1), None) for i in range(3000)]
+        data = QCInput(values=data.values + tail, locations=data.locations + [(t, 10.7, 61.) for t, _ in tail])
+        stream = QCStream(QC.init('TF'), "temperature", tests)
+        flags = {test: [] for test in tests}
+        for chunk in split(data, [7] * (len(data.values) // 7 + 1)):
+            for test, chunk_flags in stream.append(chunk).items():
+                flags[test] += chunk_flags
+            # only the point waiting for the next point with a value is kept, not the rows after it
+            assert len(stream._pending) <= stream.number_of_future and len(stream._pending_gaps) <= 1
+        assert stream.number_of_pending > 2900
+        for test, chunk_flags in stream.flush().items():
+            flags[test] += chunk_flags
+
+        assert flags == QC.execute(QC.init('TF'), data, "temperature", tests)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,9 @@
+import subprocess
+import sys
 import unittest
+import numpy as np
 import qclib.utils.Thresholds as th
-from qclib.utils.qctests_helpers import is_inside_geo_region
+from qclib.utils.qctests_helpers import is_inside_geo_region, points_inside_geo_region
 from datetime import datetime
 
 
@@ -28,6 +31,21 @@ class ValidateQCHelpers(unittest.TestCase):
 
         self.assertEqual(result_geo_region, self.true_geo_regions_location1, "Wrong location")
 
+    def test_points_inside_geo_region(self):
+        longitudes = np.array([5., 15., 25., 0., np.nan, 5.])
+        latitudes = np.array([55., 55., 55., 60.5, 55., np.nan])
+        inside = points_inside_geo_region(longitudes, latitudes, th.NorthSea)
+        assert inside.tolist() == [True, False, False, False, False, False]
+
+        # the Arctic polygon is not convex, (25, 63) is in the notch around the Gulf of Bothnia
+        inside = points_inside_geo_region(np.array([25., 25., 0.]), np.array([63., 70., 70.]), th.Arctic)
+        assert inside.tolist() == [False, True, True]
+
+    def test_qc_does_not_import_matplotlib(self):
+        output = subprocess.run([sys.executable, '-c', "import sys, qclib.QC; print('matplotlib' in sys.modules)"],
+                                check=True, capture_output=True, text=True).stdout
+        assert output.strip() == 'False'
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,130 @@
+import unittest
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+import qclib.QC as QC
+from qclib.Platforms import FerryboxQC, SailBuoyQC, SeaGliderQC
+from qclib.QCTests import QCTests
+from qclib.utils.qc_input import ColumnarQCInput
+from qclib.utils.segments import segment_index
+
+
+def make_dives(steps, values=None):
+    """Input with the given time steps in seconds"""
+    timestamps = np.datetime64('2019-04-01T00:00', 'ns') + np.concatenate(([0], np.cumsum(steps))).astype(
+        'timedelta64[s]')
+    values = np.arange(len(timestamps), dtype=np.float64) if values is None else np.asarray(values, dtype=np.float64)
+    return ColumnarQCInput(timestamps, values)
+
+
+class SegmentTests(unittest.TestCase):
+
+    def test_segment_index(self):
+        data = make_dives([60, 60, 4000, 60, 5000, 5000, 60])
+        index = segment_index(data, 3600)
+
+        assert segment_index(data, 3600) is index
+        assert index.starts.tolist() == [0, 3, 5, 6]
+        assert [(s.start, s.stop) for s in index.slices()] == [(0, 3), (3, 5), (5, 6), (6, 8)]
+        assert index.positions.tolist() == [0, 1, 2, 0, 1, 0, 0, 1]
+        assert index.has_history(2).tolist() == [False, False, True, False, False, False, False, False]
+        assert index.has_neighbours().tolist() == [False, True, False, False, False, False, False, False]
+        assert segment_index(data, 10000).number_of_segments == 1
+        assert segment_index(make_dives([])[:0], 60).number_of_segments == 0
+        assert segment_index(make_dives([]), 60).positions.tolist() == [0]
+
+    def test_windows_do_not_span_gaps(self):
+        # regular hourly samples, a 2 hour gap is no gap for the comparison of the time steps with each other
+        data = make_dives([3600] * 5 + [7200] + [3600] * 5, values=[1.] * 12)
+
+        assert QCTests.frozen_test(data) == [0] * 4 + [-1] * 8
+        assert QCTests.frozen_test(data, max_gap=3600) == [0] * 4 + [-1] * 2 + [0] * 4 + [-1] * 2
+        assert QCTests.flatness_test(data, max_variance=0.1, max_gap=3600) == [1] * 4 + [-1] * 2 + [1] * 4 + [-1] * 2
+        assert QCTests.bounded_variance_test(data, max_variance=0.1, max_gap=3600) == \
+            [0] * 3 + [1] * 3 + [0] * 3 + [1] * 3
+        pump = make_dives([3600] * 10 + [7200] + [3600] * 10, values=[1.] * 22)
+        assert QCTests.pump_history_test(pump) == [-1] * 9 + [1] * 13
+        assert QCTests.pump_history_test(pump, max_gap=3600) == [-1] * 9 + [1] * 2 + [-1] * 9 + [1] * 2
+        spikes = make_dives([3600, 3600, 4000, 4000, 3600], values=[1., 1., 1., 1., 1., 1.])
+        assert QCTests.argo_spike_test(spikes, spike_threshold=1) == [0, 1, 1, 1, 1, 0]
+        assert QCTests.argo_spike_test(spikes, spike_threshold=1, max_gap=3600) == [0, 1, 0, 0, 0, 0]
+
+    def test_window_tests_of_platforms_get_max_gap(self):
+        frozen_options = SeaGliderQC.default_qc_tests()["temperature"]["frozen_test"][1]
+        spike_options = SailBuoyQC.default_qc_tests()["temperature"]["argo_spike_test"][1]
+
+        assert frozen_options == {'max_gap': SeaGliderQC.accept_time_difference}
+        assert spike_options['max_gap'] == SailBuoyQC.accept_time_difference
+        assert 'max_gap' not in SeaGliderQC.default_qc_tests()["temperature"]["global_range_test"][1]
+        assert FerryboxQC.default_qc_tests()["temperature"]["frozen_test"][1] == {}
+        overridden = QC.init('Survey_2019_04/SeaGlider_1').with_overrides({'depth': {'flatness_test': {
+            'max_variance': 0.5}}})
+        assert overridden.qc_tests['depth']['flatness_test'][1] == {'max_gap': SeaGliderQC.accept_time_difference,
+                                                                     'max_variance': 0.5}
+
+    def test_execute_chunked_with_gaps_gives_the_flags_of_execute(self):
+        rnd = np.random.default_rng(0)
+        steps = rnd.choice([20, 60, 120, 8000], p=[0.3, 0.5, 0.15, 0.05], size=999)
+        data = make_dives(steps, values=np.round(rnd.normal(10, 0.1, 1000), 1))
+        platform = QC.init('Survey_2019_04/SeaGlider_1')
+        tests = ["argo_spike_test", "frozen_test", "global_range_test"]
+
+        expected = QC.execute(platform, data, "temperature", tests)
+        assert QC.execute_chunked(platform, data, "temperature", tests, chunk_size=37) == expected
+
+
+class ExecuteSegmentedTests(unittest.TestCase):
+
+    def make_mission(self, seed, size=2000):
+        rnd = np.random.default_rng(seed)
+        steps = rnd.choice([20, 60, 120, 8000, 30000], p=[0.3, 0.5, 0.17, 0.02, 0.01], size=size - 1)
+        values = np.round(rnd.normal(10, 0.1, size), 1)
+        values[rnd.random(size) < 0.05] = np.nan
+        return make_dives(steps, values=values)
+
+    def test_segmented_execution_gives_the_flags_of_execute(self):
+        tests = ["argo_spike_test", "frozen_test", "global_range_test"]
+        for platform_code in ['Survey_2019_04/SeaGlider_1', 'Survey_2019_04/SB_Echo', 'Survey_2019_04/Waveglider_1']:
+            platform = QC.init(platform_code)
+            for seed in range(3):
+                data = self.make_mission(seed)
+                for measurement_name in ["temperature", "depth"]:
+                    measurement_tests = tests if measurement_name == "temperature" else ["flatness_test"]
+                    expected = QC.execute(platform, data, measurement_name, measurement_tests)
+                    for chunk_size in [1, 5, 100, 10000]:
+                        assert QC.execute_segmented(platform, data, measurement_name, measurement_tests,
+                                                    chunk_size=chunk_size) == expected
+
+    def test_segments_run_in_an_executor(self):
+        data = self.make_mission(4)
+        platform = QC.init('Survey_2019_04/SeaGlider_1')
+        tests = ["argo_spike_test", "frozen_test"]
+        expected = QC.execute(platform, data, "temperature", tests, as_array=True)
+
+        for executor_class in [ThreadPoolExecutor, ProcessPoolExecutor]:
+            with executor_class(max_workers=2) as executor:
+                flags = QC.execute_segmented(platform, data, "temperature", tests, chunk_size=200, executor=executor,
+                                             as_array=True)
+            assert all(np.array_equal(flags[test], expected[test]) for test in tests)
+
+    def test_platform_without_accept_time_difference(self):
+        data = self.make_mission(5, 100)
+        for tests in [["frozen_test"], ["global_range_test", "argo_spike_test"]]:
+            with self.assertRaises(ValueError):
+                QC.execute_segmented(QC.init('TF'), data, "temperature", tests)
+
+    def test_windows_spanning_gaps_are_not_segmented(self):
+        data = self.make_mission(6, 100)
+        platform = QC.init('Survey_2019_04/SeaGlider_1')
+        for max_gap in [None, 2 * SeaGliderQC.accept_time_difference]:
+            overridden = platform.with_overrides({'temperature': {'frozen_test': {'max_gap': max_gap}}})
+            with self.assertRaises(ValueError):
+                QC.execute_segmented(overridden, data, "temperature", ["frozen_test"])
+        overridden = platform.with_overrides({'temperature': {'frozen_test': {'max_gap': 60}}})
+        assert QC.execute_segmented(overridden, data, "temperature", ["frozen_test"], chunk_size=10) == \
+            QC.execute(overridden, data, "temperature", ["frozen_test"])
+
+
+if __name__ == '__main__':
+    unittest.main()
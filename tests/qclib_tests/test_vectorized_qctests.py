@@ -0,0 +1,177 @@
+"""
+The vectorized tests are compared against the point by point implementations they replaced, on random data
+"""
+import random
+import unittest
+import warnings
+from datetime import timedelta
+
+import numpy as np
+
+from qclib.PlatformQC import PlatformQC
+from qclib.QCTests import QCTests
+from qclib.utils import Thresholds
+from qclib.utils.qc_input import QCInput, ColumnarQCInput
+from qclib.utils.validate_input import initial_flags_for_historical_test
+from qclib_tests.helpers import make_random_data
+
+
+def reference_argo_spike_test(data: QCInput, spike_threshold):
+    def is_valid(val, index):
+        if index == 0 or index == len(data.values) - 1:
+            return False
+        else:
+            return max(val[index] - val[index - 1], val[index + 1] - val[index]) < \
+                2 * min(val[index] - val[index - 1], val[index + 1] - val[index])
+
+    def k_diff(val, index):
+        if None in val[index - 1:index + 2]:
+            return np.nan
+        else:
+            return abs(val[index] - 0.5 * (val[index + 1] + val[index - 1])) \
+                - 0.5 * abs(val[index + 1] - val[index - 1])
+
+    time_stamps = np.array(data.values)[:, 0]
+    flag = np.zeros(len(data.values), dtype=int)
+    valid = np.array([is_valid(time_stamps, i) for i in range(0, len(data.values))], dtype=bool)
+
+    values = np.array(data.values)[:, 1]
+    k_diffs = np.zeros(len(data.values))
+    k_diffs[1:-1] = [k_diff(values, i) for i in range(1, len(values) - 1)]
+
+    flag[valid] = -1
+    with np.errstate(invalid='ignore'):
+        valid &= k_diffs < spike_threshold
+    flag[valid] = 1
+    return flag.tolist()
+
+
+def reference_initial_flags(data: QCInput, historical_size):
+    time_stamps = np.array(data.values)[:, 0]
+    flags = np.zeros(len(time_stamps), dtype=int)
+    time_diff_arrays = [np.diff(np.array(time_stamps[i - historical_size: i + 1]))
+                        for i in range(historical_size, len(time_stamps))]
+    timestamps_are_consecutive = [all(time_diffs < 2.1 * np.median(time_diffs))
+                                  for time_diffs in time_diff_arrays]
+    flags[[False] * historical_size + timestamps_are_consecutive] = 1
+    return flags
+
+
+def reference_frozen_test(data: QCInput):
+    size = 4
+    if len(data.values) < size:
+        return [0 for _ in range(len(data.values))]
+    flag_array = reference_initial_flags(data, size)
+    data_diff = np.diff(np.array(data.values)[:, 1].astype(float))
+    sensor_has_been_frozen = [all(data_diff[-size + i: i] == 0.0) for i in range(size, len(data.values))]
+    flag_array[[False] * size + sensor_has_been_frozen] = -1
+    return flag_array.tolist()
+
+
+def reference_flatness_test(data: QCInput, max_variance):
+    flag = np.zeros(len(data.values), dtype=int)
+    is_valid = np.ones(len(data.values), dtype=bool)
+    size = 4
+    values = np.array(data.values)[:, 1].astype(float)
+    if len(values) < size:
+        size = len(values) - 1
+    is_flat = [False] * size + [values[-size + i: i].var() < max_variance for i in range(size, len(values))]
+    flag[is_valid] = 1
+    is_valid &= np.array(is_flat)
+    flag[is_valid] = -1
+    return flag.tolist()
+
+
+def reference_bounded_variance_test(data: QCInput, max_variance):
+    size = 3
+    values = np.array(data.values)[:, 1].astype(float)
+    if len(values) < size:
+        return [0 for _ in range(len(values))]
+    flag_array = reference_initial_flags(data, size)
+    variance_array = [values[i - size: i].var() for i in range(size, len(values))]
+    flag_array[[False] * size + [var > max_variance for var in variance_array]] = -1
+    return flag_array.tolist()
+
+
+def reference_pump_history_test(data: QCInput):
+    size = 9
+    if len(data.values) < size:
+        return [-1 for _ in range(len(data.values))]
+    flag_array = reference_initial_flags(data, size)
+    flag_array[flag_array == 0] = -1
+    pump_values = np.array(data.values)[:, 1]
+    pump_values[pump_values == None] = 0
+    pump_values = pump_values.astype(int)
+    pump_has_been_turned_off = [any(pump_values[-size + i: i + 1] == 0) for i in range(size, len(data.values))]
+    flag_array[[False] * size + pump_has_been_turned_off] = -1
+    return flag_array.tolist()
+
+
+def make_random_locations(seed, size):
+    rnd = random.Random(seed)
+    data = make_random_data(seed, size, none_fraction=0)
+    values = [(time_stamp + timedelta(days=rnd.randint(0, 365)), value) for time_stamp, value in data.values]
+    values.sort(key=lambda value: value[0])
+    locations = [(value[0], rnd.uniform(-20, 40), rnd.uniform(40, 80)) for value in values]
+    values = [(t, float('nan') if rnd.random() < 0.05 else rnd.uniform(-3, 40)) for t, _ in values]
+    return QCInput(values=values, locations=locations)
+
+
+class VectorizedQCTests(unittest.TestCase):
+
+    def test_local_range_test_matches_combined_range_tests(self):
+        thresholds_lists = [Thresholds.local_range_chla_fluorescence, Thresholds.local_range_temperature,
+                            Thresholds.local_range_salinity, Thresholds.local_range_oxygen,
+                            [{'min': 0., 'max': 20., 'months': [1, 2, 3]},
+                             {'max': 10., 'area': Thresholds.NorthSea},
+                             {'min': 5., 'area': Thresholds.NorthSea, 'months': [6]}]]
+        for seed in range(10):
+            data = make_random_locations(seed, size=300)
+            for thresholds in thresholds_lists:
+                reference = PlatformQC.get_combined_flag([QCTests.range_test(data, **row) for row in thresholds])
+                assert QCTests.local_range_test(data, thresholds=thresholds) == reference, f"seed {seed}"
+
+    def test_initial_flags_for_historical_test_match_reference(self):
+        for seed in range(30):
+            data = make_random_data(seed, size=1 + seed % 12 if seed < 24 else 200)
+            for historical_size in [size for size in [1, 3, 4, 9] if size <= len(data.values)]:
+                assert initial_flags_for_historical_test(data, historical_size).tolist() == \
+                       reference_initial_flags(data, historical_size).tolist(), f"seed {seed}"
+
+    def test_initial_flags_are_computed_once_per_input(self):
+        data = ColumnarQCInput.from_qc_input(make_random_data(0, size=50))
+        flags = initial_flags_for_historical_test(data, 4)
+        flags[:] = -1
+
+        assert len(data._cache) == 2
+        assert initial_flags_for_historical_test(data, 4).tolist() == \
+               reference_initial_flags(make_random_data(0, size=50), 4).tolist()
+        initial_flags_for_historical_test(data, 3)
+        assert len(data._cache) == 3
+
+    def test_historical_window_tests_match_reference(self):
+        for seed in range(40):
+            data = make_random_data(seed, size=1 + seed % 12 if seed < 24 else 200)
+            without_none = QCInput(values=[value for value in data.values if value[1] is not None], locations=None)
+            pump = QCInput(values=[(t, None if v is None else float(int(v) % 2)) for t, v in data.values],
+                           locations=None)
+            with warnings.catch_warnings():
+                # the reference flatness test takes the variance of an empty window for a single point
+                warnings.simplefilter('ignore', RuntimeWarning)
+                assert QCTests.frozen_test(data) == reference_frozen_test(data), f"seed {seed}"
+                assert QCTests.flatness_test(without_none, max_variance=0.04) == \
+                       reference_flatness_test(without_none, 0.04), f"seed {seed}"
+                assert QCTests.bounded_variance_test(without_none, max_variance=0.5) == \
+                       reference_bounded_variance_test(without_none, 0.5), f"seed {seed}"
+                assert QCTests.pump_history_test(pump) == reference_pump_history_test(pump), f"seed {seed}"
+
+    def test_argo_spike_test_matches_reference(self):
+        for seed in range(50):
+            data = make_random_data(seed, size=1 + seed % 7 if seed < 14 else 500)
+            for threshold in [0.9, 6.]:
+                assert QCTests.argo_spike_test(data, spike_threshold=threshold) == \
+                       reference_argo_spike_test(data, threshold), f"seed {seed}"
+
+
+if __name__ == '__main__':
+    unittest.main()